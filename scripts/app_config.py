@@ -0,0 +1,116 @@
+""" config/config.ini parsed into one immutable AppConfig
+
+Qt-free so the CLI shares it; the GUI keeps it current through
+config_service.ConfigService.
+"""
+import configparser
+import io
+import os
+import stat
+from dataclasses import dataclass, field, fields
+
+from app_paths import atomic_write
+
+CONFIG_PATH = 'config/config.ini'
+
+
+def _option(section, option, group, default=None, kind=str):
+    # `group` decides which ConfigService signal a change to this option fires
+    return field(default=default, metadata={
+        'section': section, 'option': option, 'group': group, 'kind': kind})
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    api_key: str = _option('openweathermap', 'api_key', 'credentials', '')
+    # Optional local stand-in server (scripts/owm_standin.py) for testing
+    base_url: str = _option('openweathermap', 'base_url', 'credentials')
+    city_location: str = _option('default_city', 'city_location', 'city', 'London, UK')
+    update_interval: int = _option('refresh', 'update_interval', 'refresh', 600, int)
+    # Interval multiplier while hidden or minimized, 0 pauses refreshing
+    hidden_factor: float = _option('refresh', 'hidden_factor', 'refresh', 4.0, float)
+    # Calls this instance may make with the key, 0 for no limit; the
+    # default is the free plan's, instances sharing a key split it
+    calls_per_minute: int = _option('quota', 'calls_per_minute', 'quota', 60, int)
+    calls_per_day: int = _option('quota', 'calls_per_day', 'quota', 0, int)
+    # Optional metrics dump after every refresh, for kiosks in the field
+    metrics_file: str = _option('debug', 'metrics_file', 'debug', '')
+    metrics_format: str = _option('debug', 'metrics_format', 'debug', 'prometheus')
+    overlay: bool = _option('debug', 'overlay', 'debug', False, bool)
+    dashboard: bool = _option('dashboard', 'enabled', 'dashboard', False, bool)
+    dashboard_cities: str = _option('dashboard', 'cities', 'dashboard', '')
+    # Fetch through a shared scripts/weather_daemon.py instead of directly
+    daemon: bool = _option('daemon', 'enabled', 'daemon', False, bool)
+    daemon_socket: str = _option('daemon', 'socket', 'daemon', '')
+
+    @classmethod
+    def from_parser(cls, parser):
+        """ Raises ValueError when a number or boolean option doesn't parse """
+        getters = {int: parser.getint, float: parser.getfloat,
+                   bool: parser.getboolean}
+        values = {}
+        for option in fields(cls):
+            meta = option.metadata
+            getter = getters.get(meta['kind'], parser.get)
+            try:
+                values[option.name] = getter(meta['section'], meta['option'],
+                                             fallback=option.default)
+            except ValueError as exc:
+                raise ValueError(f"[{meta['section']}] {meta['option']}: {exc}") from exc
+        return cls(**values)
+
+    def changed_groups(self, other):
+        """ Groups with at least one option that differs between self and `other` """
+        return {option.metadata['group'] for option in fields(self)
+                if getattr(self, option.name) != getattr(other, option.name)}
+
+
+def new_parser():
+    # "update_interval = 600  # ten minutes" is how config.ini is documented
+    return configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+
+
+def read_config(path):
+    """ (parser, text) of the file, read in one go; a missing file is empty """
+    try:
+        with open(path, encoding='utf-8') as config_file:
+            text = config_file.read()
+    except FileNotFoundError:
+        text = ''
+    parser = new_parser()
+    parser.read_string(text, path)
+    return parser, text
+
+
+def load_config(path):
+    return AppConfig.from_parser(read_config(path)[0])
+
+
+def write_config(path, **values):
+    """ Set AppConfig fields on top of the file as it is now and replace it atomically
+
+    Re-reading first keeps options other instances saved in the meantime,
+    and the temp file plus rename means readers never see a partial file.
+    Returns the new file text.
+    """
+    parser, _ = read_config(path)
+    options = {option.name: option.metadata for option in fields(AppConfig)}
+    for name, value in values.items():
+        meta = options[name]
+        if not parser.has_section(meta['section']):
+            parser.add_section(meta['section'])
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        parser.set(meta['section'], meta['option'], str(value))
+
+    buffer = io.StringIO()
+    parser.write(buffer)
+    text = buffer.getvalue()
+
+    try:
+        # Keep whatever permissions the user gave config.ini
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+    atomic_write(path, text, mode, sync=True)
+    return text
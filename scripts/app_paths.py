@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+
+def resource_path(relative_path):
+    """ Get the absolute path to the resource, works for dev and PyInstaller """
+    try:
+        # PyInstaller creates a temporary folder and stores the path in _MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def cache_dir(subdir=''):
+    """ Get (and create) a dir in the per-user cache, which survives restarts and PyInstaller runs """
+    base_path = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    path = os.path.join(base_path, 'weatherapp', subdir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir(subdir=''):
+    """ Get (and create) a dir for per-user data worth keeping, unlike the cache """
+    base_path = os.environ.get('XDG_DATA_HOME') or os.path.join(
+        os.path.expanduser('~'), '.local', 'share')
+    path = os.path.join(base_path, 'weatherapp', subdir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write(path, data, mode=None, sync=False):
+    """ Replace `path` with `data` (bytes, or str as UTF-8) so readers never see a partial file
+
+    The temp file next to it is created 0600 by mkstemp, `mode` sets other
+    permissions before the rename and `sync` flushes it to disk first. It
+    is removed again if the write fails.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+            if sync:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,369 @@
+""" Offline benchmarks for the refresh pipeline and the UI
+
+Runs against an in-process owm_standin with Qt's offscreen platform, so
+no network, API key or display is needed:
+
+    python scripts/benchmark.py --output bench_results.json
+    python scripts/benchmark.py --compare bench_results.json
+
+Every benchmark reports p50/p95/p99 in milliseconds; results are written
+as JSON together with the commit they were measured on.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR, QThreadPool  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import owm_client  # noqa: E402
+from app_config import write_config  # noqa: E402
+from config_service import ConfigService  # noqa: E402
+from dashboard import CityTile  # noqa: E402
+from forecast_model import ForecastSeries  # noqa: E402
+from owm_standin import FaultProfile, FixtureStore, StandinServer, shift_times  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+from weather_worker import WeatherFetchWorker  # noqa: E402
+
+CITY = 'London, UK'
+
+# Run in a fresh interpreter so imports count towards time to first paint
+FIRST_PAINT_CHILD = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+import main_BC
+window = main_BC.WeatherApp()
+while window.startup_refresh_pending:
+    app.processEvents()
+print('painted', flush=True)
+'''
+
+
+def percentiles(samples):
+    """ Summary in ms of a list of durations in seconds """
+    ordered = sorted(sample * 1000 for sample in samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        'n': len(ordered),
+        'min': ordered[0],
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': ordered[-1],
+        'mean': sum(ordered) / len(ordered),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self.results = {}
+        # Kept from warm_refresh for the rendering benchmarks
+        self.window = None
+        self._tmp = tempfile.TemporaryDirectory(prefix='weatherapp-bench-')
+        self._runs = 0
+
+    def fresh_cache_dir(self):
+        """ Point cache_dir() and data_dir() at an empty directory, for cold runs """
+        self._runs += 1
+        path = os.path.join(self._tmp.name, str(self._runs))
+        os.environ['XDG_CACHE_HOME'] = os.environ['XDG_DATA_HOME'] = path
+        return path
+
+    def pump_until(self, done, timeout=30):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > deadline:
+                raise TimeoutError('benchmark step did not finish')
+            self.app.processEvents()
+            time.sleep(0.0005)
+
+    def pump_until_refreshed(self, window):
+        # The first fetch only starts after the first frame has been painted
+        self.pump_until(lambda: window.fetch_generation and not window.fetch_in_flight)
+
+    def record(self, name, samples):
+        self.results[name] = percentiles(samples)
+        stats = self.results[name]
+        print(f"{name:<28} p50 {stats['p50']:9.3f}  p95 {stats['p95']:9.3f}  "
+              f"p99 {stats['p99']:9.3f} ms  (n={stats['n']})")
+
+    def write_config(self):
+        """ A config.ini in the temp dir pointing the app at the stand-in """
+        path = os.path.join(self._tmp.name, 'config', 'config.ini')
+        # The stand-in has no quota, don't let the budget skew the timings
+        write_config(path, api_key='bench', base_url=owm_client.API_BASE_URL,
+                     city_location=CITY, calls_per_minute=0)
+        return path
+
+    def new_window(self):
+        import main_BC
+
+        return main_BC.WeatherApp(ConfigService(self.config_path, watch=False))
+
+    # -- refresh pipeline -------------------------------------------------
+
+    def cold_start(self):
+        samples = []
+        for _ in range(self.args.runs):
+            self.fresh_cache_dir()
+            start = time.perf_counter()
+            window = self.new_window()
+            self.pump_until_refreshed(window)
+            samples.append(time.perf_counter() - start)
+            window.timer.stop()
+            window.close()
+            window.deleteLater()
+            self.app.processEvents()
+        self.record('cold_start_refresh', samples)
+
+    def warm_refresh(self):
+        self.fresh_cache_dir()
+        window = self.new_window()
+        self.pump_until_refreshed(window)
+
+        fresh, revalidate = [], []
+        response_cache = window.weather_service.response_cache
+        for _ in range(self.args.runs):
+            start = time.perf_counter()
+            window.refresh_weather()
+            self.pump_until(lambda: not window.fetch_in_flight)
+            fresh.append(time.perf_counter() - start)
+
+            # Expire the payloads so the refresh has to revalidate upstream
+            for entry in response_cache._entries.values():
+                entry.fetched_at -= 24 * 3600
+            start = time.perf_counter()
+            window.refresh_weather()
+            self.pump_until(lambda: not window.fetch_in_flight)
+            revalidate.append(time.perf_counter() - start)
+        self.record('warm_refresh', fresh)
+        self.record('revalidate_refresh', revalidate)
+        window.timer.stop()
+        window.close()
+        self.window = window
+
+    def first_paint(self):
+        """ Process launch to first frame, from the snapshot warm_refresh left and without one """
+        # The child reads config/config.ini relative to its working directory
+        workdir = os.path.dirname(os.path.dirname(self.config_path))
+        scripts = os.path.dirname(os.path.abspath(__file__))
+
+        for name, cache in (('first_paint_snapshot', os.environ['XDG_CACHE_HOME']),
+                            ('first_paint_empty', None)):
+            samples = []
+            for _ in range(max(3, self.args.runs // 3)):
+                env = dict(os.environ, XDG_CACHE_HOME=cache or self.fresh_cache_dir())
+                start = time.perf_counter()
+                child = subprocess.Popen(
+                    [sys.executable, '-c', FIRST_PAINT_CHILD, scripts], cwd=workdir,
+                    env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                child.stdout.readline()
+                samples.append(time.perf_counter() - start)
+                child.kill()
+                child.wait()
+            self.record(name, samples)
+
+    def multi_city(self, count):
+        cities = [f'Bench City {i}' for i in range(count)]
+        pool = QThreadPool()
+        # Fetches are I/O bound, don't let a small CPU count serialize them
+        pool.setMaxThreadCount(owm_client.POOL_SIZE)
+        tiles = {city: CityTile(city) for city in cities}
+        samples = []
+        for _ in range(max(3, self.args.runs // (1 + count // 10))):
+            self.fresh_cache_dir()
+            service = WeatherService.with_default_caches('bench')
+            # Distinct coordinates per city so nothing dedupes upstream
+            for i, city in enumerate(cities):
+                service.geocode_cache.put(city, 40 + i * 0.01, -3 + i * 0.01)
+
+            pixmap_cache = self.window.pixmap_cache
+            done = []
+
+            def render(result):
+                if not result.revalidating:
+                    tiles[result.city].set_weather(
+                        result.weather, pixmap_cache,
+                        result.icons.get((result.weather['weather'][0]['icon'], '@2x')))
+                    done.append(result.city)
+
+            start = time.perf_counter()
+            for city in cities:
+                worker = WeatherFetchWorker(service, city, 0, include_forecast=False)
+                worker.signals.finished.connect(render)
+                pool.start(worker)
+            self.pump_until(lambda: len(done) == count, timeout=120)
+            samples.append(time.perf_counter() - start)
+        self.record(f'refresh_{count}_cities', samples)
+
+    # -- parsing and widgets ----------------------------------------------
+
+    def forecast_parse(self):
+        payload = shift_times('forecast', FixtureStore().load('forecast', 'default'))
+        samples = []
+        for _ in range(self.args.runs * 20):
+            start = time.perf_counter()
+            series = ForecastSeries.from_payload(payload)
+            series.next_slots(5)
+            series.daily(5)
+            samples.append(time.perf_counter() - start)
+        self.record('forecast_parse', samples)
+
+    def cell_update(self):
+        window = self.window
+        window.show()
+        payload = shift_times('forecast', FixtureStore().load('forecast', 'default'))
+        series = ForecastSeries.from_payload(payload)
+        # Alternate between two windows of slots so every update has real diffs
+        views = [(series.next_slots(5, series.dt[0] + offset), series.daily(5))
+                 for offset in (0, 3 * 10800)]
+        samples = []
+        for i in range(self.args.runs * 10):
+            hourly, daily = views[i % 2]
+            start = time.perf_counter()
+            window.display_hourly_forecast(hourly, {})
+            window.display_daily_forecast(daily, {})
+            self.app.processEvents()
+            samples.append(time.perf_counter() - start)
+        self.record('forecast_cell_update', samples)
+
+    def resize_storm(self):
+        window = self.window
+        window.show()
+        self.app.processEvents()
+        samples = []
+        for i in range(self.args.runs * 10):
+            width = 420 + (i * 37) % 400
+            height = 600 + (i * 53) % 300
+            start = time.perf_counter()
+            window.resize(width, height)
+            window.repaint()
+            samples.append(time.perf_counter() - start)
+        self.record('resize_storm_step', samples)
+
+        # A window drag delivers many resize events per painted frame
+        samples = []
+        for i in range(self.args.runs * 5):
+            start = time.perf_counter()
+            for step in range(20):
+                window.resize(420 + (i * 37 + step * 7) % 400, 600 + (i * 53 + step * 11) % 300)
+            window.repaint()
+            samples.append(time.perf_counter() - start)
+        self.record('resize_burst_20', samples)
+
+        samples = []
+        for _ in range(self.args.runs * 10):
+            start = time.perf_counter()
+            window.repaint()
+            samples.append(time.perf_counter() - start)
+        self.record('repaint', samples)
+
+    def run(self):
+        server = StandinServer(
+            0, faults=FaultProfile(self.args.latency, self.args.jitter,
+                                   seed=1)).start()
+        owm_client.set_base_url(server.url)
+        self.config_path = self.write_config()
+        try:
+            self.forecast_parse()
+            self.cold_start()
+            self.warm_refresh()
+            self.first_paint()
+            self.cell_update()
+            self.resize_storm()
+            for count in self.args.cities:
+                self.multi_city(count)
+        finally:
+            server.stop()
+            if self.window is not None:
+                self.window.close()
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'qt': QT_VERSION_STR,
+                'pyqt': PYQT_VERSION_STR,
+                'platform': platform.platform(),
+                'qpa': os.environ.get('QT_QPA_PLATFORM'),
+                'latency_ms': self.args.latency,
+                'jitter_ms': self.args.jitter,
+                'runs': self.args.runs,
+            },
+            'results': self.results,
+        }
+
+
+def compare(current, baseline_path, threshold):
+    """ Print p50/p95 changes against an earlier results file; True on regression """
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline_path}):")
+    regressed = False
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('p50', 'p95'):
+            change = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            changes.append(f'{key} {change:+6.1f}%')
+            if change > threshold:
+                regressed = True
+        print(f"{name:<28} {'  '.join(changes)}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the WeatherApp refresh pipeline offline.')
+    parser.add_argument('--runs', type=int, default=30,
+                        help='Repetitions per benchmark (parse and widget ones scale this up)')
+    parser.add_argument('--latency', type=float, default=20,
+                        help='Stand-in latency per request in ms')
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='Stand-in jitter in ms')
+    parser.add_argument('--cities', type=int, nargs='+', default=[1, 10, 100],
+                        help='City counts for the multi-city refresh benchmark')
+    parser.add_argument('--output', default='bench_results.json',
+                        help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to diff against')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Percent slowdown that counts as a regression with --compare')
+    args = parser.parse_args(argv)
+
+    bench = Bench(args)
+    results = bench.run()
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(results, output, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+from PyQt5.QtCore import QStringListModel, Qt
+from PyQt5.QtWidgets import QCompleter
+
+from metrics import metrics
+
+
+class CityCompleter(QCompleter):
+    """ Typeahead for a city QLineEdit, answered from the offline gazetteer
+
+    The gazetteer already filters and ranks by population, so the popup
+    shows its rows as they are instead of filtering them again.
+    """
+
+    def __init__(self, gazetteer, line_edit, limit=10):
+        self.suggestions = QStringListModel(line_edit)
+        super().__init__(self.suggestions, line_edit)
+        self.gazetteer = gazetteer
+        self.limit = limit
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_completions)
+
+    def update_completions(self, text):
+        with metrics.span('typeahead'):
+            self.suggestions.setStringList(self.gazetteer.complete(text, self.limit))
@@ -0,0 +1,107 @@
+import configparser
+import logging
+import os
+import random
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from app_config import AppConfig, new_parser, read_config, write_config
+
+log = logging.getLogger(__name__)
+
+# Let an editor finish saving before re-reading, and spread instances
+# sharing one config.ini so they don't all refetch in the same instant
+RELOAD_DELAY_MS = 250
+RELOAD_JITTER_MS = 2000
+
+# Emission order when one change touches several groups
+GROUPS = ('credentials', 'city', 'refresh', 'quota', 'debug', 'dashboard', 'daemon')
+
+
+class ConfigService(QObject):
+    """ The single parsed config.ini, kept current by watching the file
+
+    Subsystems connect to the signal of the options they use, so e.g. an
+    interval change reschedules the timer without refetching anything.
+    """
+
+    credentials_changed = pyqtSignal()  # api_key, base_url
+    city_changed = pyqtSignal()
+    refresh_changed = pyqtSignal()      # update_interval, hidden_factor
+    quota_changed = pyqtSignal()        # calls_per_minute, calls_per_day
+    debug_changed = pyqtSignal()
+    dashboard_changed = pyqtSignal()
+    daemon_changed = pyqtSignal()
+
+    def __init__(self, path, parent=None, watch=True):
+        super().__init__(parent)
+        self.path = os.path.abspath(path)
+        self.settings = AppConfig()
+        self._text = None
+        self._random = random.Random()
+        self._read()
+
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.timeout.connect(self.reload)
+        self._watcher = None
+        if watch:
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.fileChanged.connect(self._schedule_reload)
+            self._watcher.directoryChanged.connect(self._schedule_reload)
+            self._watch()
+
+    def update(self, **values):
+        """ Save AppConfig fields to disk and apply them right away """
+        self._text = write_config(self.path, **values)
+        parser = new_parser()
+        parser.read_string(self._text)
+        self._apply(AppConfig.from_parser(parser))
+
+    def reload(self):
+        self._watch()
+        self._read()
+
+    def _read(self):
+        """ Re-parse the file if its text changed
+
+        A file that doesn't parse or is empty, e.g. truncated or half-written
+        by an editor that saves in place, is ignored and the last good
+        settings are kept; the notification for the rest of the write
+        triggers another read. On the first read there are no good settings
+        yet, so the error is logged instead of passing silently.
+        """
+        try:
+            parser, text = read_config(self.path)
+            if text == self._text or (self._text is not None and not text.strip()):
+                return
+            settings = AppConfig.from_parser(parser)
+        except (OSError, configparser.Error, ValueError) as exc:
+            if self._text is None:
+                log.warning('Ignoring %s, using defaults: %s', self.path, exc)
+            return
+        self._text = text
+        self._apply(settings)
+
+    def _apply(self, settings):
+        changed = self.settings.changed_groups(settings)
+        self.settings = settings
+        for group in GROUPS:
+            if group in changed:
+                getattr(self, f'{group}_changed').emit()
+
+    def _watch(self):
+        # Atomic saves replace the file, which drops it from the watcher, so
+        # the directory is watched as well and the file re-added on reload
+        if self._watcher is None:
+            return
+        watched = self._watcher.files() + self._watcher.directories()
+        paths = [path for path in (os.path.dirname(self.path), self.path)
+                 if path not in watched and os.path.exists(path)]
+        if paths:
+            self._watcher.addPaths(paths)
+
+    def _schedule_reload(self, _path=None):
+        if not self._reload_timer.isActive():
+            self._reload_timer.start(
+                RELOAD_DELAY_MS + self._random.randint(0, RELOAD_JITTER_MS))
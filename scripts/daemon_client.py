@@ -0,0 +1,141 @@
+""" GUI side of the optional weather daemon (scripts/weather_daemon.py)
+
+Messages are JSON objects, one per line, over a local socket (a Unix
+socket, or a named pipe on Windows):
+
+    -> {"op": "subscribe", "city": "London, UK"}     push this city's results
+    -> {"op": "unsubscribe", "city": "London, UK"}
+    -> {"op": "refresh", "city": "London, UK"}       fetch now, e.g. a user search
+    <- {"op": "result", "result": {...}}             WeatherResult.to_transport()
+"""
+import json
+import os
+import tempfile
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalSocket
+
+from geocode_cache import normalize_query
+from weather_result import WeatherResult
+
+# Local connects either succeed or fail right away, this only covers a busy daemon
+CONNECT_TIMEOUT_MS = 200
+# After a failed connect fetches go in-process without trying again for
+# this long, doubling while no daemon shows up
+RETRY_MIN = 10
+RETRY_MAX = 300
+
+
+def default_socket_path():
+    """ Per-user socket in the runtime dir, shared by the daemon and its clients """
+    base_path = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', '')
+    return os.path.join(base_path, f'weatherapp-{user}.sock')
+
+
+def resolve_socket_path(configured=None):
+    """ The configured [daemon] socket, or the default when it is blank or a comment """
+    configured = (configured or '').strip()
+    if not configured or configured.startswith('#'):
+        return default_socket_path()
+    return configured
+
+
+def encode_message(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def read_messages(socket):
+    """ Decoded messages for every complete line waiting on `socket`, skipping garbage """
+    messages = []
+    while socket.canReadLine():
+        try:
+            message = json.loads(bytes(socket.readLine()))
+        except ValueError:
+            continue
+        if isinstance(message, dict):
+            messages.append(message)
+    return messages
+
+
+class DaemonClient(QObject):
+    """ One window's connection to the daemon, following a single city at a time """
+
+    result_received = pyqtSignal(object)  # WeatherResult
+    disconnected = pyqtSignal()
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.path = resolve_socket_path(path)
+        self.city = None
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_MIN
+        self._socket = QLocalSocket(self)
+        self._socket.readyRead.connect(self._read)
+        self._socket.disconnected.connect(self._on_disconnected)
+
+    def is_connected(self):
+        return self._socket.state() == QLocalSocket.ConnectedState
+
+    def connect_to_daemon(self):
+        """ True when connected, False when no daemon is listening
+
+        The connect blocks the calling thread for up to CONNECT_TIMEOUT_MS,
+        so after a failure it isn't attempted again until the backoff passed.
+        """
+        if not self.is_connected():
+            now = time.monotonic()
+            if now < self._retry_at:
+                return False
+            self._socket.abort()
+            self._socket.connectToServer(self.path)
+            if not self._socket.waitForConnected(CONNECT_TIMEOUT_MS):
+                self._socket.abort()
+                self._retry_at = now + self._retry_delay
+                self._retry_delay = min(RETRY_MAX, self._retry_delay * 2)
+                return False
+            self._retry_at, self._retry_delay = 0.0, RETRY_MIN
+            if self.city is not None:
+                # Reconnected, e.g. after a daemon restart
+                self._send('subscribe', self.city)
+        return True
+
+    def follow(self, city):
+        """ Switch the subscription to `city` and ask for a fresh result """
+        if city != self.city:
+            if self.city is not None:
+                self._send('unsubscribe', self.city)
+            self.city = city
+            # A new subscription answers with the daemon's latest result
+            self._send('subscribe', city)
+        else:
+            self._send('refresh', city)
+
+    def close(self):
+        """ Drop the connection without reporting it as a daemon failure """
+        self._socket.disconnected.disconnect(self._on_disconnected)
+        self._socket.abort()
+        self.deleteLater()
+
+    def _send(self, op, city):
+        self._socket.write(encode_message({'op': op, 'city': city}))
+        self._socket.flush()
+
+    def _read(self):
+        for message in read_messages(self._socket):
+            if message.get('op') != 'result':
+                continue
+            try:
+                result = WeatherResult.from_transport(message['result'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            # Drop late pushes for a city we stopped following, and report
+            # the city as spelled here, the daemon keeps the first spelling
+            if self.city is None or normalize_query(result.city) != normalize_query(self.city):
+                continue
+            result.city = self.city
+            self.result_received.emit(result)
+
+    def _on_disconnected(self):
+        self.disconnected.emit()
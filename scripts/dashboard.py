@@ -0,0 +1,285 @@
+from PyQt5.QtCore import QObject, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter
+from PyQt5.QtWidgets import (QFrame, QGridLayout, QLabel, QScrollArea,
+                             QVBoxLayout, QWidget)
+
+import owm_client
+from geocode_cache import normalize_query
+from gradient_background import GradientBackground
+from icon_cache import PixmapCache
+from refresh_timer import earliest_refresh
+from request_budget import BACKGROUND
+from weather_service import WeatherService
+from weather_worker import WeatherFetchWorker
+
+# Spacing between refreshes on the first pass, so tiles fill in quickly
+STARTUP_SPACING_MS = 250
+
+
+def parse_city_list(value):
+    """ One city per line in config.ini, since city names contain commas """
+    return [line.strip() for line in value.splitlines() if line.strip()]
+
+
+class RefreshScheduler(QObject):
+    """ Spreads refreshes of many locations evenly across one interval
+
+    Each location is refreshed once per `interval` seconds, but one at a
+    time, every interval / N. Queries that normalize to the same text, or
+    later resolve to the same coordinates, are refreshed only once.
+    """
+
+    due = pyqtSignal(str)
+
+    def __init__(self, interval, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.locations = []
+        self._coords = {}
+        self._next = 0
+        self._first_pass = True
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._tick)
+
+    def set_locations(self, cities):
+        self.locations = []
+        seen = set()
+        for city in cities:
+            if normalize_query(city) not in seen:
+                seen.add(normalize_query(city))
+                self.locations.append(city)
+        self._next = 0
+        self._first_pass = True
+
+    def primary(self, city):
+        """ The scheduled location that refreshes on behalf of `city` """
+        key = normalize_query(city)
+        for location in self.locations:
+            if normalize_query(location) == key:
+                return location
+        return None
+
+    def resolved(self, city, lat, lon):
+        """ Record coordinates; returns the location that already owns them, if any """
+        coords = (round(lat, 4), round(lon, 4))
+        owner = self._coords.setdefault(coords, city)
+        if owner == city or owner not in self.locations:
+            self._coords[coords] = city
+            return None
+        if city in self.locations:
+            index = self.locations.index(city)
+            self.locations.remove(city)
+            if index < self._next:
+                self._next -= 1
+        return owner
+
+    def spacing_ms(self):
+        if self._first_pass:
+            return STARTUP_SPACING_MS
+        return max(1000, int(self.interval * 1000 / max(1, len(self.locations))))
+
+    def start(self):
+        self.timer.start(0)
+
+    def restart(self):
+        """ Refresh every location again from the first, at startup spacing """
+        self._next = 0
+        self._first_pass = True
+        self.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def set_interval(self, interval):
+        self.interval = interval
+        if self.timer.isActive():
+            self.timer.start(self.spacing_ms())
+
+    def _tick(self):
+        if not self.locations:
+            return
+        if self._next >= len(self.locations):
+            self._next = 0
+            self._first_pass = False
+        location = self.locations[self._next]
+        self._next += 1
+        self.timer.start(self.spacing_ms())
+        self.due.emit(location)
+
+
+class CityTile(QFrame):
+    """ Compact current-conditions tile for the dashboard """
+
+    def __init__(self, city, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(180, 150)
+        self.setStyleSheet(
+            "CityTile { background-color: rgba(255, 255, 255, 40); border-radius: 10px; }"
+            "QLabel { color: white; }")
+        self._icon_code = None
+
+        self.name_label = QLabel(city)
+        self.name_label.setFont(QFont('Arial', 11, QFont.Bold))
+        self.name_label.setAlignment(Qt.AlignCenter)
+
+        self.icon_label = QLabel()
+        self.icon_label.setAlignment(Qt.AlignCenter)
+
+        self.temp_label = QLabel('…')
+        self.temp_label.setFont(QFont('Arial', 14))
+        self.temp_label.setAlignment(Qt.AlignCenter)
+
+        self.description_label = QLabel('')
+        self.description_label.setFont(QFont('Arial', 9))
+        self.description_label.setAlignment(Qt.AlignCenter)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.addWidget(self.name_label)
+        layout.addWidget(self.icon_label)
+        layout.addWidget(self.temp_label)
+        layout.addWidget(self.description_label)
+        self.setLayout(layout)
+
+    def set_weather(self, weather_data, pixmap_cache, icon_data=None):
+        icon_code = weather_data['weather'][0]['icon']
+        if icon_code != self._icon_code:
+            pixmap = pixmap_cache.pixmap(icon_code, '@2x', 60, icon_data)
+            if not pixmap.isNull():
+                self._icon_code = icon_code
+                self.icon_label.setPixmap(pixmap)
+        self.temp_label.setText(f"{int(weather_data['main']['temp'])}°C")
+        self.description_label.setText(
+            weather_data['weather'][0]['description'].title())
+
+    def set_error(self, message):
+        self.temp_label.setText('--')
+        self.description_label.setText(message)
+
+
+class DashboardWindow(QWidget):
+    """ Grid of city tiles refreshed by a staggered RefreshScheduler """
+
+    COLUMNS = 4
+
+    def __init__(self, api_key, cities, update_interval):
+        super().__init__()
+        self.thread_pool = QThreadPool(self)
+        self.in_flight = set()
+        self.cities = cities
+        self.weather_service = WeatherService.with_default_caches(api_key)
+        self.weather_service.geocode_cache.warm(cities)
+        self.pixmap_cache = PixmapCache(self.weather_service.icon_store)
+
+        self.scheduler = RefreshScheduler(update_interval, self)
+        self.scheduler.set_locations(cities)
+        self.scheduler.due.connect(self.refresh_location)
+        self.limit_weather_ttl()
+
+        # Tiles keyed by the scheduled location that feeds them
+        self.tiles = {}
+        self.initUI(cities)
+        self.scheduler.start()
+
+    def initUI(self, cities):
+        self.setWindowTitle('Weather Dashboard')
+        # Filled in paintEvent with a gradient brush rebuilt only on height changes
+        self.background = GradientBackground()
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        self.grid = QGridLayout()
+        self.grid.setSpacing(10)
+        self.add_tiles(cities)
+
+        grid_frame = QFrame()
+        grid_frame.setLayout(self.grid)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(grid_frame)
+        scroll_area.setStyleSheet("""
+            QScrollArea {
+                background: transparent;
+                border: none;
+            }
+            QScrollArea > QWidget > QWidget {
+                background: transparent;
+            }
+        """)
+        scroll_area.viewport().setStyleSheet("background: transparent;")
+
+        layout = QVBoxLayout()
+        layout.addWidget(scroll_area)
+        self.setLayout(layout)
+        self.resize(820, 560)
+
+    def add_tiles(self, cities):
+        for i, city in enumerate(cities):
+            tile = CityTile(city)
+            self.grid.addWidget(tile, i // self.COLUMNS, i % self.COLUMNS)
+            owner = self.scheduler.primary(city)
+            self.tiles.setdefault(owner, []).append(tile)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        self.background.paint(painter, self, event.rect())
+        painter.end()
+
+    def set_credentials(self, api_key, base_url):
+        owm_client.set_base_url(base_url)
+        self.weather_service.api_key = api_key
+        self.scheduler.restart()
+
+    def set_cities(self, cities):
+        """ Replace the tiles with `cities` and fetch them all again """
+        if cities == self.cities:
+            return
+        self.cities = cities
+        for tiles in self.tiles.values():
+            for tile in tiles:
+                self.grid.removeWidget(tile)
+                tile.deleteLater()
+        self.tiles = {}
+        self.weather_service.geocode_cache.warm(cities)
+        self.scheduler.set_locations(cities)
+        self.add_tiles(cities)
+        self.scheduler.restart()
+
+    def set_interval(self, interval):
+        self.scheduler.set_interval(interval)
+        self.limit_weather_ttl()
+
+    def limit_weather_ttl(self):
+        # Ticks aren't jittered here, but a coarse timer may still fire early
+        self.weather_service.response_cache.limit_ttl(
+            'weather', earliest_refresh(self.scheduler.interval, jitter=0))
+
+    def refresh_location(self, city):
+        # Don't stack a second fetch on a location that is still loading
+        if city in self.in_flight:
+            return
+        self.in_flight.add(city)
+        # Scheduled, not asked for, so it yields quota to searches
+        worker = WeatherFetchWorker(self.weather_service, city, 0,
+                                    include_forecast=False, priority=BACKGROUND)
+        worker.signals.finished.connect(self.on_weather_fetched)
+        self.thread_pool.start(worker)
+
+    def on_weather_fetched(self, result):
+        city = result.city
+        if not result.revalidating:
+            self.in_flight.discard(city)
+
+        if result.lat is not None:
+            owner = self.scheduler.resolved(city, result.lat, result.lon)
+            if owner is not None:
+                # Same coordinates as another location, let it feed these tiles
+                self.tiles.setdefault(owner, []).extend(self.tiles.pop(city, []))
+                city = owner
+
+        for tile in self.tiles.get(city, []):
+            if result.error:
+                tile.set_error(result.error)
+            else:
+                tile.set_weather(result.weather, self.pixmap_cache,
+                                 result.icons.get(
+                                     (result.weather['weather'][0]['icon'], '@2x')))
@@ -0,0 +1,124 @@
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+SECONDS_PER_DAY = 86400
+
+
+class ForecastSlot(NamedTuple):
+    dt: int
+    local_time: str
+    temp: float
+    humidity: int
+    wind_speed: float
+    icon: str
+
+
+class DailySummary(NamedTuple):
+    date: object  # datetime.date in the city's local time
+    temp_min: float
+    temp_max: float
+    temp_mean: float
+    icon: str
+    description: str
+
+
+class ForecastSeries:
+    """ The 3-hourly /data/2.5/forecast `list` decoded once into columns
+
+    Rows are kept in `dt` order so the next slots are a bisect away, and
+    days are cut on the city's own UTC offset rather than the host clock.
+    """
+
+    __slots__ = ('dt', 'temp', 'humidity', 'wind_speed', 'icon',
+                 'description', 'tz_offset')
+
+    def __init__(self, tz_offset=0):
+        self.dt = array('q')
+        self.temp = array('d')
+        self.humidity = array('h')
+        self.wind_speed = array('d')
+        self.icon = []
+        self.description = []
+        self.tz_offset = tz_offset
+
+    @classmethod
+    def from_payload(cls, forecast_data):
+        series = cls(forecast_data.get('city', {}).get('timezone', 0))
+        entries = forecast_data['list']
+        if any(a['dt'] > b['dt'] for a, b in zip(entries, entries[1:])):
+            entries = sorted(entries, key=lambda entry: entry['dt'])
+        for entry in entries:
+            main = entry['main']
+            weather = entry['weather'][0]
+            series.dt.append(entry['dt'])
+            series.temp.append(main['temp'])
+            series.humidity.append(main.get('humidity', 0))
+            series.wind_speed.append(entry.get('wind', {}).get('speed', 0.0))
+            series.icon.append(weather['icon'])
+            series.description.append(weather['description'])
+        return series
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Rebuild a series saved with to_dict """
+        series = cls(data['tz_offset'])
+        series.dt.extend(data['dt'])
+        series.temp.extend(data['temp'])
+        series.humidity.extend(data['humidity'])
+        series.wind_speed.extend(data['wind_speed'])
+        series.icon.extend(data['icon'])
+        series.description.extend(data['description'])
+        return series
+
+    def to_dict(self):
+        return {name: list(getattr(self, name)) if name != 'tz_offset'
+                else self.tz_offset for name in self.__slots__}
+
+    def __len__(self):
+        return len(self.dt)
+
+    def local_datetime(self, i):
+        return datetime.fromtimestamp(self.dt[i] + self.tz_offset, timezone.utc)
+
+    def slot(self, i):
+        return ForecastSlot(self.dt[i], self.local_datetime(i).strftime('%H:%M'),
+                            self.temp[i], self.humidity[i],
+                            self.wind_speed[i], self.icon[i])
+
+    def next_slots(self, count=5, now=None):
+        """ The first `count` slots strictly after `now` (epoch seconds) """
+        start = bisect_right(self.dt, int(now if now is not None else time.time()))
+        return [self.slot(i) for i in range(start, min(start + count, len(self)))]
+
+    def daily(self, days=5):
+        """ Min/max/mean per local day in one pass; icon and text from its first slot """
+        summaries = []
+        current_day = None
+        for i, dt in enumerate(self.dt):
+            day = (dt + self.tz_offset) // SECONDS_PER_DAY
+            temp = self.temp[i]
+            if day != current_day:
+                if current_day is not None:
+                    summaries.append(self._summary(current_day, *acc))
+                    if len(summaries) == days:
+                        return summaries
+                current_day = day
+                acc = [temp, temp, 0.0, 0, self.icon[i], self.description[i]]
+            if temp < acc[0]:
+                acc[0] = temp
+            if temp > acc[1]:
+                acc[1] = temp
+            acc[2] += temp
+            acc[3] += 1
+        if current_day is not None:
+            summaries.append(self._summary(current_day, *acc))
+        return summaries
+
+    @staticmethod
+    def _summary(day, temp_min, temp_max, temp_sum, count, icon, description):
+        date = (datetime(1970, 1, 1) + timedelta(days=day)).date()
+        return DailySummary(date, temp_min, temp_max, temp_sum / count,
+                            icon, description)
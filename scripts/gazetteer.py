@@ -0,0 +1,240 @@
+""" Offline city gazetteer: typeahead and lat/lon lookups without a geocode call
+
+Built from a GeoNames cities dump (https://download.geonames.org/export/dump/,
+e.g. cities15000.zip) into a compact file of name columns sorted by folded
+name plus packed coordinate and population arrays, searched with bisect:
+
+    python scripts/gazetteer.py cities15000.txt                     # per-user import
+    python scripts/gazetteer.py cities15000.txt -o data/cities.gaz  # bundle it
+
+Qt-free, the GUI completer and WeatherService share one instance.
+"""
+import argparse
+import bisect
+import functools
+import heapq
+import itertools
+import os
+import sys
+import threading
+import unicodedata
+from array import array
+
+from app_paths import atomic_write, data_dir, resource_path
+
+GAZETTEER_FILE = 'cities.gaz'
+BUNDLED_PATH = os.path.join('data', GAZETTEER_FILE)
+FORMAT_HEADER = b'weatherapp gazetteer 1\n'
+
+# What people type vs what GeoNames calls the country
+COUNTRY_ALIASES = {'uk': 'gb'}
+
+# Prefixes matching more rows than this walk the rows by population
+# instead of ranking the whole range, e.g. a single letter
+WIDE_PREFIX_ROWS = 2000
+
+
+def fold(text):
+    """ Lower case without accents, so 'São Paulo' is found as 'sao paulo' """
+    decomposed = unicodedata.normalize('NFKD', text.strip().lower())
+    return ' '.join(''.join(char for char in decomposed
+                            if not unicodedata.combining(char)).split())
+
+
+def parse_query(query):
+    """ 'Springfield, IL, US' -> ('springfield', ['il', 'us']) """
+    name, *qualifiers = [fold(part) for part in query.split(',')]
+    return name, [COUNTRY_ALIASES.get(part, part) for part in qualifiers if part]
+
+
+def _packed(typecode, values=()):
+    # Stored little-endian whatever machine built the file
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed
+
+
+class Gazetteer:
+    """ Cities sorted by folded name, loaded on first use, safe across threads
+
+    On disk: a header line, a line with the row count and text size, the
+    key, name, admin1 and country columns as newline separated text, then
+    latitude, longitude, population and the rows ordered by population as
+    packed arrays. Loading is one split and four frombytes calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            columns = [[], [], [], []]
+            arrays = [_packed('d'), _packed('d'), _packed('q'), _packed('I')]
+            try:
+                with open(self.path, 'rb') as gazetteer_file:
+                    if gazetteer_file.readline() != FORMAT_HEADER:
+                        raise ValueError(f'{self.path} is not a gazetteer file')
+                    count, text_size = map(int, gazetteer_file.readline().split())
+                    text = gazetteer_file.read(text_size).decode('utf-8')
+                    lines = text.split('\n') if count else []
+                    if len(lines) != 4 * count:
+                        raise ValueError(f'{self.path} is truncated')
+                    columns = [lines[i * count:(i + 1) * count] for i in range(4)]
+                    for packed in arrays:
+                        packed.fromfile(gazetteer_file, count)
+                        if sys.byteorder == 'big':
+                            packed.byteswap()
+            except (OSError, ValueError, EOFError):
+                # Unreadable or damaged, behave as if none was imported
+                columns = [[], [], [], []]
+                arrays = [_packed('d'), _packed('d'), _packed('q'), _packed('I')]
+            self._keys, self._names, self._admin1, self._countries = columns
+            self._lat, self._lon, self._population, self._by_population = arrays
+            self._loaded = True
+
+    def __len__(self):
+        self._load()
+        return len(self._keys)
+
+    def display_name(self, index):
+        """ The query OpenWeatherMap expects: state code only for the US """
+        country, admin1 = self._countries[index], self._admin1[index]
+        if country == 'US' and admin1:
+            return f'{self._names[index]}, {admin1}, {country}'
+        return f'{self._names[index]}, {country}'
+
+    def _matches(self, index, qualifiers, partial=False):
+        # While typing, 'London, g' should already narrow down to GB
+        codes = (self._countries[index].lower(), self._admin1[index].lower())
+        if partial:
+            return all(any(code.startswith(part) for code in codes)
+                       for part in qualifiers)
+        return all(part in codes for part in qualifiers)
+
+    def _partial_matcher(self, qualifiers):
+        """ _matches(index, qualifiers, partial=True), decided once per country and admin1 """
+        verdicts = {}
+
+        def matches(index):
+            codes = (self._countries[index], self._admin1[index])
+            verdict = verdicts.get(codes)
+            if verdict is None:
+                verdict = verdicts[codes] = self._matches(index, qualifiers, partial=True)
+            return verdict
+        return matches
+
+    def complete(self, query, limit=10):
+        """ Display names starting with `query`, most populous first """
+        self._load()
+        name, qualifiers = parse_query(query)
+        if not name:
+            return []
+        lo = bisect.bisect_left(self._keys, name)
+        hi = bisect.bisect_left(self._keys, name + '\uffff', lo)
+
+        # Ask for extra rows, the same town can be listed under two names
+        wanted = limit * 2
+        matches = self._partial_matcher(qualifiers) if qualifiers else None
+        ranked = None
+        if hi - lo > WIDE_PREFIX_ROWS:
+            # Qualifiers may match few rows or none, so the walk gives up
+            # after as many rows as the range holds and ranks the range
+            hits = []
+            for index in itertools.islice(self._by_population, hi - lo):
+                if lo <= index < hi and (matches is None or matches(index)):
+                    hits.append(index)
+                    if len(hits) == wanted:
+                        ranked = hits
+                        break
+        if ranked is None:
+            candidates = range(lo, hi)
+            if matches is not None:
+                candidates = [index for index in candidates if matches(index)]
+            ranked = heapq.nlargest(wanted, candidates,
+                                    key=self._population.__getitem__)
+        return list(dict.fromkeys(self.display_name(index) for index in ranked))[:limit]
+
+    def resolve(self, query):
+        """ (lat, lon) of the most populous exact match for `query`, or None """
+        self._load()
+        name, qualifiers = parse_query(query)
+        lo = bisect.bisect_left(self._keys, name)
+        hi = bisect.bisect_right(self._keys, name, lo)
+        matches = [index for index in range(lo, hi)
+                   if self._matches(index, qualifiers)]
+        if not matches:
+            return None
+        best = max(matches, key=self._population.__getitem__)
+        return self._lat[best], self._lon[best]
+
+
+def gazetteer_path():
+    """ A per-user import wins over the one bundled with the app, None if neither exists """
+    for path in (os.path.join(data_dir(), GAZETTEER_FILE), resource_path(BUNDLED_PATH)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def default_gazetteer():
+    """ The shared Gazetteer, or None when no gazetteer has been imported """
+    path = gazetteer_path()
+    return Gazetteer(path) if path is not None else None
+
+
+def import_geonames(source, output, min_population=0):
+    """ Convert a GeoNames cities*.txt dump, returns the number of rows written """
+    rows = []
+    with open(source, encoding='utf-8') as dump:
+        for line in dump:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15 or fields[6] != 'P':
+                continue
+            name, ascii_name, country, admin1 = fields[1], fields[2], fields[8], fields[10]
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            row = (name, admin1, country, float(fields[4]), float(fields[5]), population)
+            # Index the ASCII spelling too when folding doesn't already cover it
+            for key in dict.fromkeys((fold(name), fold(ascii_name))):
+                if key:
+                    rows.append((key,) + row)
+    rows.sort()
+
+    keys, names, admin1s, countries, lats, lons, populations = zip(*rows) if rows else [()] * 7
+    text = '\n'.join(keys + names + admin1s + countries).encode('utf-8')
+    by_population = sorted(range(len(rows)), key=lambda index: -populations[index])
+
+    chunks = [FORMAT_HEADER, f'{len(rows)} {len(text)}\n'.encode('ascii'), text]
+    for typecode, values in (('d', lats), ('d', lons), ('q', populations),
+                             ('I', by_population)):
+        chunks.append(_packed(typecode, values).tobytes())
+    atomic_write(output, b''.join(chunks), 0o644)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Import a GeoNames cities dump as the offline gazetteer.')
+    parser.add_argument('source', help='GeoNames cities*.txt, e.g. cities15000.txt')
+    parser.add_argument('-o', '--output',
+                        help=f'Where to write it (default: the per-user data dir, '
+                             f'or {BUNDLED_PATH} to bundle it with the app)')
+    parser.add_argument('--min-population', type=int, default=0,
+                        help='Skip smaller places to keep the file small')
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.join(data_dir(), GAZETTEER_FILE)
+    count = import_geonames(args.source, output, args.min_population)
+    print(f'Wrote {count} entries to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
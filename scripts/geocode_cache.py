@@ -0,0 +1,83 @@
+import logging
+import re
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+
+def normalize_query(query):
+    """ Fold case and whitespace so 'london,UK ' and 'London, UK' share an entry """
+    query = re.sub(r'\s*,\s*', ', ', query.strip().lower())
+    return re.sub(r'\s+', ' ', query)
+
+
+class GeocodeCache:
+    """ Persistent city -> (lat, lon) lookups backed by SQLite, safe across threads
+
+    A database that can't be opened or written, e.g. a damaged or locked
+    file, only costs persistence: lookups are then kept in memory.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._coords = {}
+        try:
+            self._conn = self._open(db_path)
+        except sqlite3.Error as exc:
+            log.warning('Geocode cache kept in memory only, cannot open %s: %s',
+                        db_path, exc)
+            self._conn = self._open(':memory:')
+
+    @staticmethod
+    def _open(db_path):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocode ('
+                'query TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)')
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _lookup(self, key):
+        try:
+            return self._conn.execute(
+                'SELECT lat, lon FROM geocode WHERE query = ?', (key,)).fetchone()
+        except sqlite3.Error as exc:
+            log.warning('Geocode cache read failed: %s', exc)
+            return None
+
+    def warm(self, queries):
+        """ Load the given queries into memory so the first lookup skips SQLite """
+        with self._lock:
+            for query in queries:
+                key = normalize_query(query)
+                row = self._lookup(key)
+                if row:
+                    self._coords[key] = row
+
+    def get(self, query):
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._coords:
+                return self._coords[key]
+            row = self._lookup(key)
+            if row:
+                self._coords[key] = row
+            return row
+
+    def put(self, query, lat, lon):
+        key = normalize_query(query)
+        with self._lock:
+            self._coords[key] = (lat, lon)
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO geocode (query, lat, lon) VALUES (?, ?, ?)',
+                    (key, lat, lon))
+                self._conn.commit()
+            except sqlite3.Error as exc:
+                # Still answered from memory for the rest of this session
+                log.warning('Geocode cache write failed: %s', exc)
@@ -0,0 +1,143 @@
+""" All OpenWeatherMap weather icons packed into one file, memory-mapped at runtime
+
+Built as a packaging step and bundled next to the other icons, so a fresh
+install paints its first frame without a single icon download:
+
+    python scripts/icon_atlas.py                        # download from openweathermap.org
+    python scripts/icon_atlas.py --source ~/.cache/weatherapp/icons
+    python scripts/icon_atlas.py --base-url http://127.0.0.1:8765   # the stand-in
+
+Layout: an 8 byte magic, the index length as a little-endian uint32, a
+JSON index of {"01d@2x": [offset, length], ...} and the PNGs back to back.
+"""
+import argparse
+import functools
+import json
+import mmap
+import os
+import struct
+import sys
+
+from app_paths import atomic_write, resource_path
+
+ATLAS_PATH = os.path.join('icons', 'weather_icons.atlas')
+MAGIC = b'WXATLAS1'
+HEADER = struct.Struct('<8sI')
+
+# Every icon code OpenWeatherMap uses, day and night
+ICON_CODES = [f'{number}{time_of_day}'
+              for number in ('01', '02', '03', '04', '09', '10', '11', '13', '50')
+              for time_of_day in ('d', 'n')]
+VARIANTS = ('', '@2x')
+ICON_BASE_URL = 'https://openweathermap.org'
+
+
+class IconAtlas:
+    """ Read-only view of an atlas file; slices are served straight from the mapping """
+
+    def __init__(self, path):
+        """ Raises OSError or ValueError when the file is missing or not an atlas """
+        with open(path, 'rb') as atlas_file:
+            self._map = mmap.mmap(atlas_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_size = HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not an icon atlas')
+            start = HEADER.size + index_size
+            index = json.loads(self._map[HEADER.size:start])
+            self._index = {name: (start + offset, start + offset + length)
+                           for name, (offset, length) in index.items()}
+        except (struct.error, ValueError, TypeError):
+            self._map.close()
+            raise ValueError(f'{path} is not an icon atlas') from None
+        if hasattr(self._map, 'madvise'):
+            # Icons are read in bursts, let the kernel read the file ahead in one go
+            self._map.madvise(mmap.MADV_WILLNEED)
+
+    def __len__(self):
+        return len(self._index)
+
+    def has(self, icon_code, variant=''):
+        return f'{icon_code}{variant}' in self._index
+
+    def get(self, icon_code, variant=''):
+        span = self._index.get(f'{icon_code}{variant}')
+        if span is None:
+            return None
+        return self._map[span[0]:span[1]]
+
+
+@functools.lru_cache(maxsize=None)
+def default_atlas():
+    """ The atlas bundled with the app, or None when this build has none """
+    try:
+        return IconAtlas(resource_path(ATLAS_PATH))
+    except (OSError, ValueError):
+        return None
+
+
+def write_atlas(path, icons):
+    """ Write {(icon_code, variant): png_bytes} as an atlas, atomically """
+    index, offset = {}, 0
+    for (icon_code, variant), data in sorted(icons.items()):
+        index[f'{icon_code}{variant}'] = [offset, len(data)]
+        offset += len(data)
+    index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+
+    chunks = [HEADER.pack(MAGIC, len(index_bytes)), index_bytes]
+    chunks += [data for _, data in sorted(icons.items())]
+    atomic_write(path, b''.join(chunks), 0o644)
+
+
+def collect_icons(source=None, base_url=ICON_BASE_URL):
+    """ Every code and variant, from PNGs in `source` where present, else downloaded """
+    # Only the packaging step downloads, keep http/ssl out of the app's startup
+    import urllib.error
+    import urllib.request
+
+    icons, missing = {}, []
+    for icon_code in ICON_CODES:
+        for variant in VARIANTS:
+            name = f'{icon_code}{variant}.png'
+            data = None
+            if source is not None:
+                try:
+                    with open(os.path.join(source, name), 'rb') as icon_file:
+                        data = icon_file.read()
+                except OSError:
+                    pass
+            if data is None:
+                try:
+                    with urllib.request.urlopen(f'{base_url}/img/wn/{name}',
+                                                timeout=10) as response:
+                        data = response.read()
+                except (urllib.error.URLError, OSError):
+                    missing.append(name)
+                    continue
+            icons[(icon_code, variant)] = data
+    return icons, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Pack every OpenWeatherMap weather icon into one atlas file.')
+    parser.add_argument('-o', '--output', default=ATLAS_PATH,
+                        help=f'Atlas to write (default: {ATLAS_PATH})')
+    parser.add_argument('--source',
+                        help='Directory of <code><variant>.png files to use before downloading')
+    parser.add_argument('--base-url', default=ICON_BASE_URL,
+                        help='Where to download missing icons from, e.g. a local stand-in')
+    args = parser.parse_args(argv)
+
+    icons, missing = collect_icons(args.source, args.base_url.rstrip('/'))
+    if missing:
+        print(f"Could not get {len(missing)} icons: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    write_atlas(args.output, icons)
+    size = os.path.getsize(args.output)
+    print(f'Wrote {len(icons)} icons ({size / 1024:.0f} KB) to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
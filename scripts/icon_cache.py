@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+
+from metrics import metrics
+
+# Decoded pixmaps are width * height * 4 bytes; icons are small, so this
+# holds far more than one screen's worth while capping a weeks-long run
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class PixmapCache:
+    """ In-memory LRU of decoded, already-scaled icon pixmaps (GUI thread only)
+
+    Bounded both by entry count and by decoded size, whichever is hit first.
+    """
+
+    def __init__(self, store, max_entries=64, max_bytes=DEFAULT_MAX_BYTES):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._pixmaps = OrderedDict()
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def pixmap(self, icon_code, variant='', size=None, data=None):
+        """ Return the icon scaled to `size` px, decoding `data` or the disk copy on a miss """
+        key = (icon_code, variant, size)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            metrics.cache('pixmap', 'hit')
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        metrics.cache('pixmap', 'miss')
+
+        pixmap = QPixmap()
+        if data is None:
+            data = self.store.get(icon_code, variant)
+        with metrics.span('icon_decode'):
+            if data:
+                pixmap.loadFromData(data)
+            if pixmap.isNull():
+                # Don't cache failures, the next refresh may have the bytes
+                return pixmap
+
+            if size is not None:
+                pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio,
+                                       Qt.SmoothTransformation)
+        self._pixmaps[key] = pixmap
+        self.bytes += pixmap_bytes(pixmap)
+        # Never evict the pixmap just added, even if it alone is over budget
+        while len(self._pixmaps) > 1 and (len(self._pixmaps) > self.max_entries
+                                          or self.bytes > self.max_bytes):
+            self.bytes -= pixmap_bytes(self._pixmaps.popitem(last=False)[1])
+        return pixmap
@@ -0,0 +1,40 @@
+import os
+
+from app_paths import atomic_write
+
+
+class IconStore:
+    """ On-disk store of raw OpenWeatherMap icon PNGs, safe to use from worker threads
+
+    With an `atlas` (icon_atlas.IconAtlas) bundled icons are served from
+    it and only codes it doesn't know are downloaded and kept on disk.
+    """
+
+    def __init__(self, directory, atlas=None):
+        self.directory = directory
+        self.atlas = atlas
+
+    def path(self, icon_code, variant=''):
+        return os.path.join(self.directory, f'{icon_code}{variant}.png')
+
+    def get(self, icon_code, variant=''):
+        if self.atlas is not None:
+            data = self.atlas.get(icon_code, variant)
+            if data is not None:
+                return data
+        try:
+            with open(self.path(icon_code, variant), 'rb') as icon_file:
+                return icon_file.read()
+        except OSError:
+            return None
+
+    def has(self, icon_code, variant=''):
+        if self.atlas is not None and self.atlas.has(icon_code, variant):
+            return True
+        return os.path.exists(self.path(icon_code, variant))
+
+    def put(self, icon_code, variant, data):
+        try:
+            atomic_write(self.path(icon_code, variant), data)
+        except OSError:
+            pass
@@ -1,90 +1,252 @@
 #! venv/bin/ python3.10
 
-import configparser
 import os
 import sys
-from datetime import datetime
+import time
 
-import requests
-from PyQt5.QtCore import QRectF, QSize, Qt, QTimer
-from PyQt5.QtGui import (QBrush, QColor, QFont, QIcon, QLinearGradient, QMovie,
-                         QPainter, QPainterPath, QPalette, QPixmap)
+from PyQt5.QtCore import QEvent, QSize, Qt, QThreadPool, QTimer
+from PyQt5.QtGui import QFont, QIcon, QKeySequence, QMovie, QPainter
 from PyQt5.QtWidgets import (QApplication, QDialog, QFormLayout, QFrame,
                              QHBoxLayout, QLabel, QLineEdit, QMessageBox,
-                             QPushButton, QScrollArea, QSizePolicy, QSpinBox,
-                             QVBoxLayout, QWidget)
-
-
-def resource_path(relative_path):
-    """ Get the absolute path to the resource, works for dev and PyInstaller """
+                             QPushButton, QScrollArea, QShortcut, QSizePolicy,
+                             QSpinBox, QVBoxLayout, QWidget)
+
+from app_config import CONFIG_PATH
+from app_paths import cache_dir, resource_path
+from city_completer import CityCompleter
+from config_service import ConfigService
+from gazetteer import default_gazetteer
+from gradient_background import GradientBackground
+from icon_atlas import default_atlas
+from icon_cache import PixmapCache
+from icon_store import IconStore
+from memory_report import memory_report
+from metrics import metrics
+from request_budget import BACKGROUND, USER
+from refresh_timer import AdaptiveRefreshTimer
+from snapshot import load_snapshot, save_snapshot
+
+
+def format_age(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return 'under a minute'
+    if minutes < 120:
+        return f'{minutes} min'
+    return f'{minutes // 60} h'
+
+
+def close_splash():
+    # PyInstaller onefile builds made with --splash keep it up until closed
     try:
-        # PyInstaller creates a temporary folder and stores the path in _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+        import pyi_splash
+    except ImportError:
+        return
+    pyi_splash.close()
 
 
-config = configparser.ConfigParser()
-config_path = resource_path('config/config.ini')
-config.read(config_path)
+class AnimatedLabel(QLabel):
+    """ Plays a QMovie scaled to the label, smooth-scaling each frame once per size """
 
+    # Scaled frames kept for the current size. Once full, further frames are
+    # scaled on the fly instead of evicting ones the next loop needs again
+    FRAME_CACHE_BYTES = 16 * 1024 * 1024
 
-class AnimatedLabel(QLabel):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.movie = None
+        self.frame_cache = {}
+        self.frame_cache_size = None
+        self.frame_cache_bytes = 0
 
     def setMovie(self, movie):
+        if self.movie is not None:
+            self.movie.frameChanged.disconnect(self.update_frame)
         self.movie = movie
+        self.clear_frame_cache()
         super().setMovie(movie)
         self.movie.frameChanged.connect(self.update_frame)
 
-    def update_frame(self):
-        frame = self.movie.currentPixmap()
-        if not frame.isNull():
+    def clear_frame_cache(self):
+        self.frame_cache.clear()
+        self.frame_cache_size = self.size()
+        self.frame_cache_bytes = 0
+
+    def update_frame(self, frame_number=None):
+        if frame_number is None:
+            frame_number = self.movie.currentFrameNumber()
+        if self.size() != self.frame_cache_size:
+            self.clear_frame_cache()
+
+        scaled_frame = self.frame_cache.get(frame_number)
+        if scaled_frame is None:
+            frame = self.movie.currentPixmap()
+            if frame.isNull():
+                return
             # Scale the frame to the size of the label, maintaining aspect ratio
             scaled_frame = frame.scaled(
                 self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.setPixmap(scaled_frame)
+            frame_bytes = (scaled_frame.width() * scaled_frame.height()
+                           * scaled_frame.depth() // 8)
+            if (frame_number >= 0 and self.frame_cache_bytes + frame_bytes
+                    <= self.FRAME_CACHE_BYTES):
+                self.frame_cache[frame_number] = scaled_frame
+                self.frame_cache_bytes += frame_bytes
+        self.setPixmap(scaled_frame)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
+        if event.size() != event.oldSize():
+            self.clear_frame_cache()
         if self.movie and self.movie.state() == QMovie.Running:
             self.update_frame()
 
 
+class ForecastCell(QFrame):
+    """ One hourly/daily forecast slot, built once and updated in place """
+
+    def __init__(self, width, icon_size, parent=None):
+        super().__init__(parent)
+        self.icon_size = icon_size
+        self._title = None
+        self._icon_code = None
+        self._temp = None
+
+        # Create labels
+        self.title_label = QLabel()
+        self.title_label.setAlignment(Qt.AlignCenter)
+        self.title_label.setFont(QFont('Arial', 10))
+        self.title_label.setStyleSheet("color: white;")
+
+        self.icon_label = QLabel()
+        self.icon_label.setAlignment(Qt.AlignCenter)
+
+        self.temp_label = QLabel()
+        self.temp_label.setAlignment(Qt.AlignCenter)
+        self.temp_label.setFont(QFont('Arial', 10))
+        self.temp_label.setStyleSheet("color: white;")
+
+        # Create a vertical layout for the forecast slot
+        v_layout = QVBoxLayout()
+        v_layout.addWidget(self.title_label)
+        v_layout.addWidget(self.icon_label)
+        v_layout.addWidget(self.temp_label)
+
+        self.setLayout(v_layout)
+        self.setFixedWidth(width)
+        self.setStyleSheet("")
+
+    def set_forecast(self, title, temp, icon_code, load_pixmap):
+        """ Only touch the labels whose value changed since the last refresh """
+        if title != self._title:
+            self._title = title
+            self.title_label.setText(title)
+        if temp != self._temp:
+            self._temp = temp
+            self.temp_label.setText(f"{temp}°C")
+        if icon_code != self._icon_code:
+            pixmap = load_pixmap(icon_code, self.icon_size)
+            if not pixmap.isNull():
+                # Remember the code only once it rendered, so misses retry
+                self._icon_code = icon_code
+                self.icon_label.setPixmap(pixmap)
+        self.setVisible(True)
+
+
+class DebugOverlay(QLabel):
+    """ Live per-stage timings, cache hit rates and memory use, toggled with F12 """
+
+    def __init__(self, parent=None, report_memory=None):
+        super().__init__(parent)
+        self.report_memory = report_memory
+        self.setFont(QFont('Monospace', 8))
+        self.setTextFormat(Qt.PlainText)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 170); color: #e0e0e0;"
+            "padding: 6px; border-radius: 5px;")
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_text)
+        self.hide()
+
+    def toggle(self):
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+        else:
+            self.update_text()
+            self.show()
+            self.raise_()
+            self.timer.start(1000)
+
+    def update_text(self):
+        if self.report_memory is not None:
+            self.report_memory()
+        snapshot = metrics.snapshot()
+        lines = [f"{'stage':<22}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}"]
+        caches = {}
+        for timer in snapshot['timers']:
+            stage = '/'.join([timer['name'], *timer['labels'].values()])
+            lines.append(f"{stage:<22}{timer['count']:>5}"
+                         f"{timer['p50'] * 1000:>9.1f}{timer['p95'] * 1000:>9.1f}")
+        for counter in snapshot['counters']:
+            if counter['name'] == 'cache_requests':
+                results = caches.setdefault(counter['labels']['cache'], {})
+                results[counter['labels']['result']] = counter['value']
+        if caches:
+            lines.append('')
+        for cache, results in caches.items():
+            hits = results.get('hit', 0) + results.get('revalidated', 0)
+            lines.append(f"{cache + ' cache':<22}{hits:>5} / {sum(results.values())} hits")
+        gauges = {(gauge['name'], *gauge['labels'].values()): gauge['value']
+                  for gauge in snapshot['gauges']}
+        if gauges:
+            lines.append('')
+        if ('rss_bytes',) in gauges:
+            lines.append(f"{'rss':<22}{gauges[('rss_bytes',)] / 2 ** 20:>8.1f} MB")
+        if ('qt_objects',) in gauges:
+            lines.append(f"{'qt widgets / objects':<22}{gauges[('qt_widgets',)]:>5}"
+                         f" / {gauges[('qt_objects',)]}")
+        for key, value in gauges.items():
+            if key[0] == 'cache_bytes':
+                lines.append(f"{key[1] + ' cache':<22}{value / 1024:>8.1f} KB")
+            elif key[0] == 'api_quota_available':
+                limit = gauges.get(('api_quota_limit', key[1]), 0)
+                lines.append(f"{'quota / ' + key[1]:<22}{value:>5.0f} / {limit} left")
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.move(10, 60)
+
+
 class SettingsWindow(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, config, parent=None):
         super().__init__(parent)
         self.setWindowTitle('Settings')
-        self.config = configparser.ConfigParser()
-        config_path = resource_path('config/config.ini')
-        self.config.read(config_path)
+        self.config = config
 
         self.initUI()
 
     def initUI(self):
         layout = QFormLayout()
+        settings = self.config.settings
 
         # API Key
         self.api_key_input = QLineEdit(self)
-        self.api_key_input.setText(
-            self.config.get('openweathermap', 'api_key'))
+        self.api_key_input.setText(settings.api_key)
         layout.addRow('API Key:', self.api_key_input)
 
         # Default City
         self.city_input = QLineEdit(self)
-        self.city_input.setText(self.config.get(
-            'default_city', 'city_location', fallback='London, UK'))
+        self.city_input.setText(settings.city_location)
+        if default_gazetteer() is not None:
+            CityCompleter(default_gazetteer(), self.city_input)
         layout.addRow('Default City:', self.city_input)
 
         # Update Interval
         self.update_interval_input = QSpinBox(self)
         self.update_interval_input.setRange(
             60, 86400)  # Between 1 minute and 24 hours
-        self.update_interval_input.setValue(self.config.getint(
-            'refresh', 'update_interval', fallback=600))
+        self.update_interval_input.setValue(settings.update_interval)
         layout.addRow('Update Interval (seconds):', self.update_interval_input)
 
         # Buttons
@@ -100,18 +262,16 @@ class SettingsWindow(QDialog):
         self.setLayout(layout)
 
     def save_settings(self):
-        # Update the config object
-        self.config.set('openweathermap', 'api_key', self.api_key_input.text())
-        self.config.set('default_city', 'city_location',
-                        self.city_input.text())
-        self.config.set('refresh', 'update_interval', str(
-            self.update_interval_input.value()))
-
-        # Write changes to the config.ini file
-        config_path = resource_path('config/config.ini')
-
-        with open(config_path, 'w') as configfile:
-            self.config.write(configfile)
+        # Written atomically; the config service signals what actually changed
+        try:
+            self.config.update(
+                api_key=self.api_key_input.text(),
+                city_location=self.city_input.text(),
+                update_interval=self.update_interval_input.value())
+        except OSError as exc:
+            QMessageBox.critical(self, 'Settings',
+                                 f'Settings could not be saved: {exc.strerror}')
+            return
 
         # Inform the user
         QMessageBox.information(self, 'Settings', 'Settings have been saved.')
@@ -119,35 +279,65 @@ class SettingsWindow(QDialog):
 
 
 class WeatherApp(QWidget):
-    def __init__(self):
+    def __init__(self, config=None):
         super().__init__()
+        self.started = time.perf_counter()
+        # Parsed once and watched, shared with other windows when passed in
+        self.config = config or ConfigService(resource_path(CONFIG_PATH), self)
         self.load_config()
         self.current_city = None
         self.first_load = True
-        self._debugging = False
+        # Fetches run on a worker thread; stale results are dropped by generation
+        self.thread_pool = QThreadPool(self)
+        self.fetch_generation = 0
+        self.fetch_in_flight = False
+        # The data layer pulls in requests, so it is set up after the first paint
+        self.weather_service = None
+        self.startup_refresh_pending = True
+        # Connection to a shared weather_daemon.py, when [daemon] is enabled
+        self.daemon = None
+        # Last known weather, painted in the first frame before any network I/O
+        self.snapshot_path = os.path.join(cache_dir(), 'snapshot.json')
+        self.snapshot = load_snapshot(self.snapshot_path, self.city_location)
+        # Decoded icons are kept as scaled pixmaps in memory, bundled ones are
+        # sliced from the memory-mapped atlas instead of read or downloaded
+        self.pixmap_cache = PixmapCache(IconStore(cache_dir('icons'), default_atlas()))
+        # Window gradient brush, only rebuilt when the height changes
+        self.background = GradientBackground()
+
+        # Set up the timer, re-armed after each fetch instead of ticking blindly
+        self.timer = AdaptiveRefreshTimer(self.update_interval, self,
+                                          hidden_factor=self.hidden_factor)
+        self.timer.timeout.connect(self.refresh_weather)
+        self.refetch_pending = False
         self.initUI()
 
-        # Set up the timer
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.refresh_weather)
-        # Convert seconds to milliseconds
-        self.timer.start(self.update_interval * 1000)
+        # Only the subsystems whose options changed react to config edits
+        self.config.credentials_changed.connect(self.on_credentials_changed)
+        self.config.city_changed.connect(self.on_city_changed)
+        self.config.refresh_changed.connect(self.on_refresh_changed)
+        self.config.quota_changed.connect(self.on_quota_changed)
+        self.config.debug_changed.connect(self.on_debug_changed)
+        self.config.daemon_changed.connect(self.on_daemon_changed)
 
     def load_config(self):
-        self.config = configparser.ConfigParser()
-        config_path = resource_path('config/config.ini')
-        self.config.read(config_path)
-        self.api_key = self.config.get('openweathermap', 'api_key')
-        self.city_location = self.config.get(
-            'default_city', 'city_location', fallback='London, UK')
-        self.update_interval = self.config.getint(
-            'refresh', 'update_interval', fallback=600)  # In seconds
+        settings = self.config.settings
+        self.api_key = settings.api_key
+        self.base_url = settings.base_url
+        self.city_location = settings.city_location
+        self.update_interval = settings.update_interval  # In seconds
+        self.hidden_factor = settings.hidden_factor
+        self.calls_per_minute = settings.calls_per_minute
+        self.calls_per_day = settings.calls_per_day
+        self.metrics_file = settings.metrics_file
+        self.metrics_format = settings.metrics_format
+        self.use_daemon = settings.daemon
+        self.daemon_socket = settings.daemon_socket
 
     def initUI(self):
         self.setWindowTitle('Weather App')
-
-        # Set gradient background
-        self.updateGradientBackground()
+        # paintEvent draws the whole gradient background, skip Qt's own fill
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
 
         # Input field for the city name
         self.city_input = QLineEdit(self)
@@ -158,6 +348,11 @@ class WeatherApp(QWidget):
         self.city_input.setSizePolicy(
             QSizePolicy.Expanding, QSizePolicy.Preferred)
 
+        # Offline typeahead, when a gazetteer has been imported or bundled
+        if default_gazetteer() is not None:
+            completer = CityCompleter(default_gazetteer(), self.city_input)
+            completer.activated[str].connect(self.search_completed_city)
+
         # Button to trigger weather fetching
         self.get_weather_btn = QPushButton('', self)
         self.get_weather_btn.clicked.connect(self.show_weather)
@@ -209,6 +404,12 @@ class WeatherApp(QWidget):
         self.weather_info.setStyleSheet("color: white;")
         self.weather_info.setAlignment(Qt.AlignCenter)
 
+        # Label to show a non-blocking "refreshing" state
+        self.status_label = QLabel('', self)
+        self.status_label.setFont(QFont('Arial', 9))
+        self.status_label.setStyleSheet("color: white;")
+        self.status_label.setAlignment(Qt.AlignCenter)
+
         # Label to display the weather icon
         self.icon_label = QLabel('', self)
         self.icon_label.setAlignment(Qt.AlignCenter)
@@ -230,6 +431,12 @@ class WeatherApp(QWidget):
         self.hourly_frame.setLayout(self.hourly_layout)
         self.hourly_frame.setStyleSheet("")
 
+        # Fixed pool of cells, refreshed in place instead of rebuilt
+        self.hourly_cells = [ForecastCell(70, 40) for _ in range(5)]
+        for cell in self.hourly_cells:
+            cell.setVisible(False)
+            self.hourly_layout.addWidget(cell)
+
         # Scroll area for hourly forecast
         self.hourly_scroll_area = QScrollArea()
         self.hourly_scroll_area.setWidgetResizable(True)
@@ -255,6 +462,11 @@ class WeatherApp(QWidget):
         self.forecast_frame.setLayout(self.forecast_layout)
         self.forecast_frame.setStyleSheet("")
 
+        self.daily_cells = [ForecastCell(80, 50) for _ in range(5)]
+        for cell in self.daily_cells:
+            cell.setVisible(False)
+            self.forecast_layout.addWidget(cell)
+
         # Scroll area for daily forecast
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -274,6 +486,7 @@ class WeatherApp(QWidget):
         # Layout setup
         layout = QVBoxLayout()
         layout.addLayout(search_layout)
+        layout.addWidget(self.status_label)
         layout.addWidget(self.icon_label)
         layout.addWidget(self.weather_info)
 
@@ -291,29 +504,55 @@ class WeatherApp(QWidget):
 
         self.setLayout(layout)
         self.resize(500, 700)
-        self.show()
 
-        # Load weather data on startup
-        self.show_weather()
+        # Stage timings overlay, F12 or [debug] overlay = true in config.ini
+        self.debug_overlay = DebugOverlay(self, self.memory_report)
+        QShortcut(QKeySequence('F12'), self, self.debug_overlay.toggle)
+        if self.config.settings.overlay:
+            self.debug_overlay.toggle()
 
-    def updateGradientBackground(self):
-        # Set gradient background
-        palette = QPalette()
-        gradient = QLinearGradient(0, 0, 0, self.height())
-        gradient.setColorAt(0.0, QColor('#2196F3'))  # Start color (blue)
-        gradient.setColorAt(1.0, QColor('#4CAF50'))  # End color (green)
-        palette.setBrush(QPalette.Window, QBrush(gradient))
-        self.setPalette(palette)
+        # Paint the last known weather right away, the refresh starts once
+        # the first frame is on screen (see paintEvent)
+        if self.snapshot is not None:
+            self.render_result(self.snapshot)
+            self.status_label.setText(
+                f'Showing data from {format_age(self.snapshot.stale_age)} ago')
 
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.updateGradientBackground()
+        self.show()
 
-    def show_weather(self):
-        if self._debugging:
-            print(f"{self.api_key}")
-            # self._debugging = False
+    def configure_weather_service(self):
+        # Imported here so requests and the HTTP pool don't delay startup
+        import owm_client
+        from weather_service import WeatherService
+
+        owm_client.set_base_url(self.base_url)
+        owm_client.set_quota(self.calls_per_minute, self.calls_per_day)
+        if self.weather_service is None:
+            # Qt-free data layer with the on-disk icon, geocode and response caches
+            self.weather_service = WeatherService.with_default_caches(self.api_key)
+        self.weather_service.api_key = self.api_key
+        # An early jittered tick must not be answered from the cache
+        self.weather_service.response_cache.limit_ttl('weather', self.timer.earliest_refresh())
+        self.weather_service.geocode_cache.warm([self.city_location])
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_refresh_visibility()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_refresh_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_refresh_visibility()
+
+    def update_refresh_visibility(self):
+        # Nobody is looking at a hidden or minimized window, refresh less often
+        self.timer.set_visible(self.isVisible() and not self.isMinimized())
 
+    def show_weather(self):
         if self.first_load:
             self.first_load = False
             self.current_city = self.city_location
@@ -325,255 +564,280 @@ class WeatherApp(QWidget):
         city = self.current_city
 
         if city:
-            # Get coordinates of the city
-            geo_url = (
-                f'http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={self.api_key}'
-            )
-            geo_response = requests.get(geo_url)
-            if geo_response.status_code == 200 and geo_response.json():
-                geo_data = geo_response.json()[0]
-                lat = geo_data['lat']
-                lon = geo_data['lon']
-
-                # Fetch current weather data
-                weather_url = (
-                    f'http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_key}&units=metric'
-                )
-                weather_response = requests.get(weather_url)
-                if weather_response.status_code == 200:
-                    weather_data = weather_response.json()
-                    temp = weather_data['main']['temp']
-                    description = weather_data['weather'][0]['description']
-                    icon_code = weather_data['weather'][0]['icon']
-                    humidity = weather_data['main']['humidity']
-                    wind_speed = weather_data['wind']['speed']
-
-                    # Fetch the weather icon
-                    icon_url = f'http://openweathermap.org/img/wn/{icon_code}@2x.png'
-                    icon_response = requests.get(icon_url)
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(icon_response.content)
-                    self.icon_label.setPixmap(pixmap)
-
-                    # Format the weather details
-                    weather_details = (
-                        f"<b>Temperature:</b> {int(temp)}°C<br>"
-                        f"<b>Description:</b> {description.title()}<br>"
-                        f"<b>Humidity:</b> {humidity}%<br>"
-                        f"<b>Wind Speed:</b> {wind_speed} m/s"
-                    )
-                    self.weather_info.setText(weather_details)
-
-                    # Fetch 5-day forecast data
-                    forecast_url = (
-                        f'http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={self.api_key}&units=metric'
-                    )
-                    if self._debugging:
-                        print(f"Forecast URL: {forecast_url}")  # Debugging
-
-                    forecast_response = requests.get(forecast_url)
-
-                    if self._debugging:
-                        # Debugging
-                        print(
-                            f"Forecast Response Status Code: {forecast_response.status_code}")
-                        # Debugging
-                        print(
-                            f"Forecast Response Text: {forecast_response.text}")
-
-                    if forecast_response.status_code == 200:
-                        forecast_data = forecast_response.json()
-                        forecast_list = forecast_data['list']
-
-                        # Clear previous hourly forecast widgets
-                        for i in reversed(range(self.hourly_layout.count())):
-                            widget_to_remove = self.hourly_layout.itemAt(
-                                i).widget()
-                            self.hourly_layout.removeWidget(widget_to_remove)
-                            widget_to_remove.setParent(None)
-
-                        # Display forecasts for the next 5 hours
-                        self.display_hourly_forecast(forecast_list)
-
-                        # Process daily forecasts
-                        daily_data = {}
-                        for entry in forecast_list:
-                            date_text = entry['dt_txt']
-                            date = date_text.split(' ')[0]
-
-                            if date not in daily_data:
-                                daily_data[date] = {
-                                    'temps': [],
-                                    'icon': entry['weather'][0]['icon'],
-                                    'weather': entry['weather'][0]['description'],
-                                }
-
-                            daily_data[date]['temps'].append(
-                                entry['main']['temp'])
-
-                        # Clear previous daily forecast widgets
-                        for i in reversed(range(self.forecast_layout.count())):
-                            widget_to_remove = self.forecast_layout.itemAt(
-                                i).widget()
-                            self.forecast_layout.removeWidget(widget_to_remove)
-                            widget_to_remove.setParent(None)
-
-                        # Display forecasts for up to 5 days
-                        for date, data in list(daily_data.items())[:5]:
-                            avg_temp = int(
-                                sum(data['temps']) / len(data['temps']))
-                            icon_code = data['icon']
-                            description = data['weather']
-                            self.add_forecast_widget(
-                                date, avg_temp, icon_code, description)
-                    else:
-                        error_message = forecast_response.json().get('message', 'Unknown error')
-                        self.weather_info.setText(
-                            f'Error fetching forecast data: {error_message}')
-
-                        if self._debugging:
-                            print(
-                                f"Error fetching forecast data: {error_message}")
-                else:
-                    self.weather_info.setText('Error fetching weather data.')
-                    self.icon_label.clear()
-            else:
-                self.weather_info.setText('City not found. Please try again.')
-                self.icon_label.clear()
+            self.start_fetch(city)
         else:
             self.weather_info.setText('Please enter a city name.')
             self.icon_label.clear()
 
-    def refresh_weather(self):
-        if hasattr(self, 'current_city') and self.current_city:
-            self.show_weather()
+    def search_completed_city(self, city):
+        self.city_input.setText(city)
+        self.show_weather()
 
-    def display_hourly_forecast(self, forecast_list):
-        # Get current time
-        now = datetime.now()
-
-        # Find entries for the next 5 hours
-        hourly_forecasts = []
-        for entry in forecast_list:
-            forecast_time = datetime.strptime(
-                entry['dt_txt'], '%Y-%m-%d %H:%M:%S')
-            if forecast_time > now and len(hourly_forecasts) < 5:
-                hourly_forecasts.append(entry)
-
-        for entry in hourly_forecasts:
-            self.add_hourly_forecast_widget(entry)
-
-    def add_hourly_forecast_widget(self, entry):
-        # Extract data
-        forecast_time = datetime.strptime(entry['dt_txt'], '%Y-%m-%d %H:%M:%S')
-        time_str = forecast_time.strftime('%H:%M')
-
-        temp = int(entry['main']['temp'])
-        icon_code = entry['weather'][0]['icon']
-
-        # Fetch the weather icon
-        icon_url = f'http://openweathermap.org/img/wn/{icon_code}.png'
-        icon_response = requests.get(icon_url)
-        pixmap = QPixmap()
-        pixmap.loadFromData(icon_response.content)
-        pixmap = pixmap.scaled(40, 40, Qt.KeepAspectRatio,
-                               Qt.SmoothTransformation)
+    def start_fetch(self, city, priority=USER):
+        from weather_worker import WeatherFetchWorker
+
+        daemon = self.daemon_client()
+        if daemon is not None:
+            # The daemon fetches and pushes the result, and keeps pushing
+            # updates on its own schedule
+            self.fetch_generation += 1
+            self.fetch_in_flight = True
+            self.fetch_started = time.perf_counter()
+            self.status_label.setText('Refreshing…')
+            daemon.follow(city)
+            return
+
+        if self.weather_service is None:
+            self.configure_weather_service()
+        # A newer request supersedes any fetch still in flight
+        self.fetch_generation += 1
+        self.fetch_in_flight = True
+        self.fetch_started = time.perf_counter()
+        self.status_label.setText('Refreshing…')
+        self.timer.fetch_started()
+
+        worker = WeatherFetchWorker(self.weather_service, city,
+                                    self.fetch_generation, priority=priority)
+        worker.signals.finished.connect(self.on_weather_fetched)
+        self.thread_pool.start(worker)
+
+    def daemon_client(self):
+        """ The daemon connection, or None to fetch in-process """
+        if not self.use_daemon:
+            return None
+        if self.daemon is None:
+            from daemon_client import DaemonClient
+
+            self.daemon = DaemonClient(self.daemon_socket or None, self)
+            self.daemon.result_received.connect(self.on_daemon_result)
+            self.daemon.disconnected.connect(self.on_daemon_disconnected)
+        # No daemon running is not an error, this window fetches for itself
+        return self.daemon if self.daemon.connect_to_daemon() else None
+
+    def on_daemon_result(self, result):
+        if not self.fetch_in_flight:
+            # Pushed by the daemon's own refresh rather than asked for
+            self.fetch_started = time.perf_counter()
+        result.generation = self.fetch_generation
+        self.on_weather_fetched(result)
+
+    def on_daemon_disconnected(self):
+        # The daemon went away, take over refreshing; a request it
+        # never answered is sent again in-process
+        if self.fetch_in_flight:
+            self.fetch_in_flight = False
+            self.start_fetch(self.current_city)
+
+    def on_weather_fetched(self, result):
+        if result.generation != self.fetch_generation:
+            return
+        if result.revalidating:
+            # Cached data shown while the worker is still checking upstream
+            self.status_label.setText('Refreshing…')
+        else:
+            self.fetch_in_flight = False
+            self.status_label.setText(
+                f'Offline, showing data from {format_age(result.stale_age)} ago'
+                if result.stale_age is not None else '')
+
+        snapshot = self.snapshot
+        if (result.error and snapshot is not None and not result.revalidating
+                and result.city == snapshot.city):
+            # Keep the last known weather up instead of replacing it with an error
+            age = snapshot.stale_age + time.perf_counter() - self.started
+            self.status_label.setText(
+                f'{result.error} Showing data from {format_age(age)} ago')
+        else:
+            with metrics.span('ui_render'):
+                self.render_result(result)
+
+        if not result.revalidating:
+            self.timer.fetch_finished(result.ok, result.rate_limited,
+                                      result.retry_after)
+            if result.ok and result.forecast is not None:
+                save_snapshot(self.snapshot_path, result)
+                self.snapshot = None
+            metrics.observe('refresh', time.perf_counter() - self.fetch_started)
+            if self.metrics_file:
+                self.memory_report()
+                metrics.dump(self.metrics_file, self.metrics_format)
+
+    def memory_report(self, python_objects=False):
+        """ RSS, live Qt objects and cache sizes, also published as metrics gauges """
+        caches = {'pixmap': self.pixmap_cache}
+        if self.weather_service is not None:
+            caches['response'] = self.weather_service.response_cache
+        return memory_report(caches, python_objects)
+
+    def render_result(self, result):
+        if result.error:
+            self.weather_info.setText(result.error)
+            self.icon_label.clear()
+            return
+
+        weather_data = result.weather
+        temp = weather_data['main']['temp']
+        description = weather_data['weather'][0]['description']
+        icon_code = weather_data['weather'][0]['icon']
+        humidity = weather_data['main']['humidity']
+        wind_speed = weather_data['wind']['speed']
+
+        self.icon_label.setPixmap(self.pixmap_cache.pixmap(
+            icon_code, '@2x', data=result.icons.get((icon_code, '@2x'))))
+
+        # Format the weather details
+        weather_details = (
+            f"<b>Temperature:</b> {int(temp)}°C<br>"
+            f"<b>Description:</b> {description.title()}<br>"
+            f"<b>Humidity:</b> {humidity}%<br>"
+            f"<b>Wind Speed:</b> {wind_speed} m/s"
+        )
+        self.weather_info.setText(weather_details)
 
-        # Create labels
-        time_label = QLabel(time_str)
-        time_label.setAlignment(Qt.AlignCenter)
-        time_label.setFont(QFont('Arial', 10))
-        time_label.setStyleSheet("color: white;")
+        if result.forecast_error:
+            self.weather_info.setText(result.forecast_error)
+            return
 
-        icon_label = QLabel()
-        icon_label.setPixmap(pixmap)
-        icon_label.setAlignment(Qt.AlignCenter)
+        # Display forecasts for the next 5 hours and up to 5 days
+        self.display_hourly_forecast(result.hourly, result.icons)
+        self.display_daily_forecast(result.daily, result.icons)
 
-        temp_label = QLabel(f"{temp}°C")
-        temp_label.setAlignment(Qt.AlignCenter)
-        temp_label.setFont(QFont('Arial', 10))
-        temp_label.setStyleSheet("color: white;")
+    def refresh_weather(self):
+        # Coalesce with a fetch that is still running, e.g. a user search
+        if self.fetch_in_flight:
+            return
+        if self.daemon is not None and self.daemon.is_connected():
+            return  # The daemon pushes refreshed results by itself
+        if self.current_city:
+            # The city on screen, not whatever is half-typed in the search
+            # box; nobody asked for it, so it yields to searches for quota
+            self.start_fetch(self.current_city, BACKGROUND)
+
+    def forecast_pixmap_loader(self, icons):
+        def load_pixmap(icon_code, size):
+            # Decoded and scaled once, then served from the pixmap cache
+            return self.pixmap_cache.pixmap(
+                icon_code, '', size, icons.get((icon_code, '')))
+        return load_pixmap
+
+    def display_hourly_forecast(self, hourly_forecasts, icons):
+        load_pixmap = self.forecast_pixmap_loader(icons)
+        for i, cell in enumerate(self.hourly_cells):
+            if i >= len(hourly_forecasts):
+                cell.setVisible(False)
+                continue
+            slot = hourly_forecasts[i]
+            cell.set_forecast(slot.local_time, int(slot.temp), slot.icon,
+                              load_pixmap)
+
+    def display_daily_forecast(self, daily, icons):
+        load_pixmap = self.forecast_pixmap_loader(icons)
+        for i, cell in enumerate(self.daily_cells):
+            if i >= len(daily):
+                cell.setVisible(False)
+                continue
+            day = daily[i]
+            cell.set_forecast(day.date.strftime('%A'), int(day.temp_mean),
+                              day.icon, load_pixmap)
 
-        # Create a vertical layout for the hourly forecast
-        v_layout = QVBoxLayout()
-        v_layout.addWidget(time_label)
-        v_layout.addWidget(icon_label)
-        v_layout.addWidget(temp_label)
-
-        # Create a frame for the hourly forecast
-        hour_frame = QFrame()
-        hour_frame.setLayout(v_layout)
-        hour_frame.setFixedWidth(70)
-        hour_frame.setStyleSheet("")
-
-        self.hourly_layout.addWidget(hour_frame)
-
-    def add_forecast_widget(self, date_str, temp, icon_code, description):
-        # Parse the date string
-        date = datetime.strptime(date_str, '%Y-%m-%d')
-        day_name = date.strftime('%A')
-
-        # Fetch the weather icon
-        icon_url = f'http://openweathermap.org/img/wn/{icon_code}.png'
-        icon_response = requests.get(icon_url)
-        pixmap = QPixmap()
-        pixmap.loadFromData(icon_response.content)
-        pixmap = pixmap.scaled(50, 50, Qt.KeepAspectRatio,
-                               Qt.SmoothTransformation)
+    def open_settings(self):
+        # Saved settings reach us through the config service signals
+        SettingsWindow(self.config, self).exec_()
 
-        # Create labels
-        day_label = QLabel(day_name)
-        day_label.setAlignment(Qt.AlignCenter)
-        day_label.setFont(QFont('Arial', 10))
-        day_label.setStyleSheet("color: white;")
+    def on_credentials_changed(self):
+        self.load_config()
+        if self.weather_service is not None:
+            self.configure_weather_service()
+            self.schedule_refetch()
 
-        icon_label = QLabel()
-        icon_label.setPixmap(pixmap)
-        icon_label.setAlignment(Qt.AlignCenter)
+    def on_city_changed(self):
+        self.load_config()
+        if self.weather_service is not None:
+            self.weather_service.geocode_cache.warm([self.city_location])
+        if self.fetch_generation:
+            self.first_load = True  # Force reload of default city
+            self.schedule_refetch()
 
-        temp_label = QLabel(f"{temp}°C")
-        temp_label.setAlignment(Qt.AlignCenter)
-        temp_label.setFont(QFont('Arial', 10))
-        temp_label.setStyleSheet("color: white;")
+    def on_refresh_changed(self):
+        # Reschedule with the new interval, nothing needs refetching
+        self.load_config()
+        self.timer.hidden_factor = self.hidden_factor
+        self.timer.set_interval(self.update_interval)
+        if self.weather_service is not None:
+            self.weather_service.response_cache.limit_ttl(
+                'weather', self.timer.earliest_refresh())
 
-        # Create a vertical layout for the day's forecast
-        v_layout = QVBoxLayout()
-        v_layout.addWidget(day_label)
-        v_layout.addWidget(icon_label)
-        v_layout.addWidget(temp_label)
+    def on_daemon_changed(self):
+        self.load_config()
+        if self.daemon is not None:
+            self.daemon.close()
+            self.daemon = None
+        if self.fetch_generation:
+            # Refetch through the new socket, or in-process
+            self.schedule_refetch()
+
+    def on_quota_changed(self):
+        self.load_config()
+        if self.weather_service is not None:
+            import owm_client
 
-        # Create a frame for the day's forecast
-        day_frame = QFrame()
-        day_frame.setLayout(v_layout)
-        day_frame.setFixedWidth(80)
-        day_frame.setStyleSheet("")
+            owm_client.set_quota(self.calls_per_minute, self.calls_per_day)
 
-        self.forecast_layout.addWidget(day_frame)
+    def on_debug_changed(self):
+        self.load_config()
+        if self.debug_overlay.isHidden() == self.config.settings.overlay:
+            self.debug_overlay.toggle()
 
-    def open_settings(self):
-        settings_window = SettingsWindow(self)
-        if settings_window.exec_():
-            # Reload configurations
-            self.load_config()
-            # Restart the timer with the new interval
-            self.timer.stop()
-            self.timer.start(self.update_interval * 1000)
-            # Refresh the weather data
-            self.first_load = True  # Force reload of default city
+    def schedule_refetch(self):
+        # Key and city often change in the same save, fetch once for both
+        if not self.refetch_pending:
+            self.refetch_pending = True
+            QTimer.singleShot(0, self.refetch)
+
+    def refetch(self):
+        self.refetch_pending = False
+        if self.first_load:
             self.show_weather()
+        elif self.current_city:
+            self.start_fetch(self.current_city)
 
     def paintEvent(self, event):
-        # Overriding paintEvent to handle transparency
-        path = QPainterPath()
-        rect_f = QRectF(self.rect())
-        path.addRoundedRect(rect_f, 10.0, 10.0)
+        # Gradient brush is cached per height, only the exposed area is filled
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setClipPath(path)
+        self.background.paint(painter, self, event.rect())
+        painter.end()
         super().paintEvent(event)
 
+        if self.startup_refresh_pending:
+            self.startup_refresh_pending = False
+            metrics.observe('first_paint', time.perf_counter() - self.started)
+            close_splash()
+            # Load weather data on startup
+            QTimer.singleShot(0, self.show_weather)
+
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    weather_app = WeatherApp()
+    config = ConfigService(resource_path(CONFIG_PATH))
+    if config.settings.dashboard:
+        import owm_client
+        from dashboard import DashboardWindow, parse_city_list
+
+        settings = config.settings
+        owm_client.set_base_url(settings.base_url)
+        owm_client.set_quota(settings.calls_per_minute, settings.calls_per_day)
+        config.quota_changed.connect(lambda: owm_client.set_quota(
+            config.settings.calls_per_minute, config.settings.calls_per_day))
+        weather_app = DashboardWindow(
+            settings.api_key, parse_city_list(settings.dashboard_cities),
+            settings.update_interval)
+        config.credentials_changed.connect(lambda: weather_app.set_credentials(
+            config.settings.api_key, config.settings.base_url))
+        config.refresh_changed.connect(lambda: weather_app.set_interval(
+            config.settings.update_interval))
+        config.dashboard_changed.connect(lambda: weather_app.set_cities(
+            parse_city_list(config.settings.dashboard_cities)))
+        weather_app.show()
+    else:
+        weather_app = WeatherApp(config)
     sys.exit(app.exec_())
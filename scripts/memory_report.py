@@ -0,0 +1,59 @@
+""" Process memory and live Qt object counts, for kiosks that run for weeks
+
+memory_report() also publishes the numbers as metrics gauges, so they end
+up in the debug overlay and in the [debug] metrics_file dump.
+"""
+import gc
+import os
+import sys
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtWidgets import QApplication
+
+from metrics import metrics
+
+
+def rss_bytes():
+    """ Resident set size now, or the peak where only that is available; None if unknown """
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def qt_object_counts():
+    """ Live widgets, and QObjects owned by the application or a top-level widget """
+    app = QApplication.instance()
+    if app is None:
+        return {'qt_widgets': 0, 'qt_objects': 0}
+    objects = len(app.findChildren(QObject))
+    for widget in app.topLevelWidgets():
+        objects += 1 + len(widget.findChildren(QObject))
+    return {'qt_widgets': len(app.allWidgets()), 'qt_objects': objects}
+
+
+def memory_report(caches=None, python_objects=False):
+    """ {'rss_bytes': ..., 'qt_widgets': ..., 'qt_objects': ..., 'pixmap_cache_bytes': ...}
+
+    `caches` maps a name to anything with a `bytes` attribute. Counting
+    Python objects walks the whole heap, so it is only done on request.
+    """
+    report = {'rss_bytes': rss_bytes()}
+    report.update(qt_object_counts())
+    if python_objects:
+        report['python_objects'] = len(gc.get_objects())
+    for name, value in report.items():
+        if value is not None:
+            metrics.gauge(name, value)
+    for name, cache in (caches or {}).items():
+        report[f'{name}_cache_bytes'] = cache.bytes
+        metrics.gauge('cache_bytes', cache.bytes, cache=name)
+    return report
@@ -0,0 +1,164 @@
+""" Process-wide timing spans and cache counters for the refresh hot path
+
+Stages are recorded with labels, e.g. metrics.span('http', endpoint='forecast'),
+and can be read back as a snapshot for the debug overlay, or dumped as
+Prometheus text or JSON lines. Nothing here ever records request URLs, so
+the API key can't leak through it.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from app_paths import atomic_write
+
+# Recent durations kept per timer for the p50/p95 shown in the overlay
+RESERVOIR_SIZE = 256
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class _Timer:
+    __slots__ = ('count', 'total', 'max', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """ Thread-safe registry of labelled timers and counters """
+
+    def __init__(self, prefix='weatherapp'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = _Timer()
+            timer.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, value, **labels):
+        """ Set a point-in-time value, e.g. gauge('cache_bytes', n, cache='pixmap') """
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def cache(self, cache, result):
+        """ Shorthand for the cache hit/miss counters, e.g. cache('geocode', 'hit') """
+        self.count('cache_requests', cache=cache, result=result)
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        with self._lock:
+            timers = [
+                {'name': name, 'labels': dict(labels), 'count': timer.count,
+                 'sum': timer.total, 'max': timer.max,
+                 'p50': timer.percentile(0.50), 'p95': timer.percentile(0.95)}
+                for (name, labels), timer in sorted(self._timers.items())]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())]
+            gauges = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._gauges.items())]
+        return {'time': time.time(), 'uptime': time.time() - self.started,
+                'timers': timers, 'counters': counters, 'gauges': gauges}
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        seen = set()
+        for timer in snapshot['timers']:
+            metric = f"{self.prefix}_{timer['name']}_seconds"
+            labels = _format_labels(sorted(timer['labels'].items()))
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} summary')
+            lines.append(f"{metric}_count{labels} {timer['count']}")
+            lines.append(f"{metric}_sum{labels} {timer['sum']:.6f}")
+        for timer in snapshot['timers']:
+            metric = f"{self.prefix}_{timer['name']}_seconds_max"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} gauge')
+            labels = _format_labels(sorted(timer['labels'].items()))
+            lines.append(f"{metric}{labels} {timer['max']:.6f}")
+        for counter in snapshot['counters']:
+            metric = f"{self.prefix}_{counter['name']}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            labels = _format_labels(sorted(counter['labels'].items()))
+            lines.append(f"{metric}{labels} {counter['value']}")
+        for gauge in snapshot['gauges']:
+            metric = f"{self.prefix}_{gauge['name']}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} gauge')
+            labels = _format_labels(sorted(gauge['labels'].items()))
+            lines.append(f"{metric}{labels} {gauge['value']}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, fmt='prometheus'):
+        """ Rewrite `path` atomically as Prometheus text, or append one JSON line """
+        try:
+            if fmt == 'jsonl':
+                with open(path, 'a', encoding='utf-8') as dump_file:
+                    dump_file.write(json.dumps(self.snapshot()) + '\n')
+                return
+            # node_exporter reads the textfile directory as another user
+            atomic_write(path, self.to_prometheus(), 0o644)
+        except OSError:
+            pass
+
+
+metrics = Metrics()
@@ -0,0 +1,196 @@
+""" Local history of current-weather observations, kept at three resolutions
+
+Every observation is stored raw and folded into its hourly and daily
+bucket as it arrives, so there is no batch downsampling step and each
+resolution can be pruned on its own schedule. Rows are clustered on
+(location, level, dt) in a WITHOUT ROWID table, so a range scan for one
+site is a single index walk, and values are scaled integers that SQLite
+stores in one to three bytes.
+"""
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+RAW, HOURLY, DAILY = 0, 1, 2
+
+# Seconds each resolution is kept for
+RETENTION = {
+    RAW: 2 * 86400,
+    HOURLY: 60 * 86400,
+    DAILY: 5 * 365 * 86400,
+}
+
+# Prune at most this often, it is a handful of indexed deletes
+PRUNE_INTERVAL = 3600
+
+# Fixed-point scales: temp and wind in hundredths, pressure in hPa
+TEMP_SCALE = 100
+WIND_SCALE = 100
+
+
+class Observation(NamedTuple):
+    dt: int  # Observation time, or bucket start for hourly/daily rows
+    count: int
+    temp: float  # Mean over the bucket
+    temp_min: float
+    temp_max: float
+    humidity: float
+    pressure: float
+    wind_speed: float
+    wind_max: float
+    condition: int  # OpenWeatherMap condition id of the latest observation
+
+
+def location_key(lat, lon):
+    # ~1 km grid so the same site geocoded twice shares its history
+    return round(lat, 2), round(lon, 2)
+
+
+def resolution_for(seconds):
+    """ Finest resolution still retained over a `seconds` long window """
+    for level in (RAW, HOURLY, DAILY):
+        if seconds <= RETENTION[level]:
+            return level
+    return DAILY
+
+
+class ObservationStore:
+    """ SQLite time series of observations per location, safe across threads """
+
+    def __init__(self, db_path):
+        """ Raises sqlite3.Error when the file is damaged, locked or unwritable """
+        self._lock = threading.Lock()
+        self._locations = {}
+        self._last_prune = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            self._create_tables()
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def _create_tables(self):
+        self._conn.executescript(
+            # auto_vacuum only takes effect when set before the first table
+            'PRAGMA auto_vacuum = INCREMENTAL;'
+            'PRAGMA journal_mode = WAL;'
+            'CREATE TABLE IF NOT EXISTS locations ('
+            ' id INTEGER PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL,'
+            ' UNIQUE (lat, lon));'
+            'CREATE TABLE IF NOT EXISTS observations ('
+            ' location INTEGER NOT NULL, level INTEGER NOT NULL, dt INTEGER NOT NULL,'
+            ' n INTEGER NOT NULL, temp_sum INTEGER NOT NULL,'
+            ' temp_min INTEGER NOT NULL, temp_max INTEGER NOT NULL,'
+            ' humidity_sum INTEGER NOT NULL, pressure_sum INTEGER NOT NULL,'
+            ' wind_sum INTEGER NOT NULL, wind_max INTEGER NOT NULL,'
+            ' condition INTEGER NOT NULL, last_dt INTEGER NOT NULL,'
+            ' PRIMARY KEY (location, level, dt)) WITHOUT ROWID;')
+        self._conn.commit()
+
+    def _location_id(self, lat, lon, create=True):
+        key = location_key(lat, lon)
+        location = self._locations.get(key)
+        if location is None:
+            row = self._conn.execute(
+                'SELECT id FROM locations WHERE lat = ? AND lon = ?', key).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                row = (self._conn.execute(
+                    'INSERT INTO locations (lat, lon) VALUES (?, ?)', key).lastrowid,)
+            location = self._locations[key] = row[0]
+        return location
+
+    def record(self, lat, lon, weather_data):
+        """ Store a /data/2.5/weather payload; the same observation twice is a no-op """
+        main = weather_data['main']
+        wind = weather_data.get('wind', {})
+        dt = int(weather_data['dt'])
+        tz_offset = weather_data.get('timezone', 0)
+        temp = round(main['temp'] * TEMP_SCALE)
+        wind_speed = round(wind.get('speed', 0.0) * WIND_SCALE)
+        values = (temp, temp, temp, main.get('humidity', 0),
+                  round(main.get('pressure', 0)), wind_speed, wind_speed,
+                  weather_data['weather'][0]['id'], dt)
+
+        with self._lock:
+            location = self._location_id(lat, lon)
+            inserted = self._conn.execute(
+                'INSERT OR IGNORE INTO observations VALUES '
+                '(?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (location, RAW, dt, *values)).rowcount
+            if inserted:
+                # Days are cut on the site's own UTC offset, like the forecast
+                for level, bucket in ((HOURLY, dt - dt % 3600),
+                                      (DAILY, dt - (dt + tz_offset) % 86400)):
+                    self._conn.execute(
+                        'INSERT INTO observations VALUES '
+                        '(?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (location, level, dt) DO UPDATE SET '
+                        ' n = n + 1, temp_sum = temp_sum + excluded.temp_sum,'
+                        ' temp_min = min(temp_min, excluded.temp_min),'
+                        ' temp_max = max(temp_max, excluded.temp_max),'
+                        ' humidity_sum = humidity_sum + excluded.humidity_sum,'
+                        ' pressure_sum = pressure_sum + excluded.pressure_sum,'
+                        ' wind_sum = wind_sum + excluded.wind_sum,'
+                        ' wind_max = max(wind_max, excluded.wind_max),'
+                        ' condition = CASE WHEN excluded.last_dt >= last_dt'
+                        '  THEN excluded.condition ELSE condition END,'
+                        ' last_dt = max(last_dt, excluded.last_dt)',
+                        (location, level, bucket, *values))
+            self._conn.commit()
+            now = time.time()
+            if now - self._last_prune > PRUNE_INTERVAL:
+                self._prune(now)
+        return bool(inserted)
+
+    def series(self, lat, lon, start, end=None, level=None):
+        """ Observations with start <= dt < end, oldest first
+
+        Without `level` the finest resolution retained for the whole window
+        is used, e.g. raw for the last 24 h and hourly for the last 7 days.
+        """
+        end = end if end is not None else time.time() + 1
+        if level is None:
+            level = resolution_for(time.time() - start)
+        with self._lock:
+            location = self._location_id(lat, lon, create=False)
+            if location is None:
+                return []
+            rows = self._conn.execute(
+                'SELECT dt, n, temp_sum, temp_min, temp_max, humidity_sum,'
+                ' pressure_sum, wind_sum, wind_max, condition FROM observations'
+                ' WHERE location = ? AND level = ? AND dt >= ? AND dt < ?'
+                ' ORDER BY dt', (location, level, int(start), int(end))).fetchall()
+        return [Observation(dt, n, temp_sum / n / TEMP_SCALE, temp_min / TEMP_SCALE,
+                            temp_max / TEMP_SCALE, humidity_sum / n, pressure_sum / n,
+                            wind_sum / n / WIND_SCALE, wind_max / WIND_SCALE, condition)
+                for dt, n, temp_sum, temp_min, temp_max, humidity_sum,
+                pressure_sum, wind_sum, wind_max, condition in rows]
+
+    def recent(self, lat, lon, seconds, now=None):
+        """ The last `seconds` of history, e.g. recent(lat, lon, 7 * 86400) """
+        now = now if now is not None else time.time()
+        return self.series(lat, lon, now - seconds, now + 1,
+                           resolution_for(seconds))
+
+    def at(self, lat, lon, when):
+        """ The latest raw observation at or before `when`, or None """
+        rows = self.series(lat, lon, when - RETENTION[RAW], when + 1, RAW)
+        return rows[-1] if rows else None
+
+    def prune(self, now=None):
+        with self._lock:
+            self._prune(now if now is not None else time.time())
+
+    def _prune(self, now):
+        for level, keep in RETENTION.items():
+            self._conn.execute(
+                'DELETE FROM observations WHERE level = ? AND dt < ?',
+                (level, int(now - keep)))
+        self._conn.commit()
+        # Hand the freed pages back so the file stays bounded, not just its
+        # rows; executescript because execute() stops after the first page
+        self._conn.executescript('PRAGMA incremental_vacuum;')
+        self._last_prune = now
@@ -0,0 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from request_budget import USER, OverBudget, RequestBudget
+
+DEFAULT_API_BASE_URL = 'http://api.openweathermap.org'
+DEFAULT_ICON_BASE_URL = 'http://openweathermap.org'
+
+API_BASE_URL = DEFAULT_API_BASE_URL
+ICON_BASE_URL = DEFAULT_ICON_BASE_URL
+
+# (connect, read) timeouts in seconds per kind of request
+TIMEOUTS = {
+    'geocode': (3.05, 10),
+    'weather': (3.05, 10),
+    'forecast': (3.05, 15),
+    'icon': (3.05, 5),
+}
+
+# Quota tokens per kind of request; icons are static files, not API calls
+QUOTA_COST = {
+    'geocode': 1,
+    'weather': 1,
+    'forecast': 1,
+    'icon': 0,
+}
+
+# Enough connections and threads for weather + forecast + a full set of icons
+POOL_SIZE = 12
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
+
+executor = ThreadPoolExecutor(max_workers=POOL_SIZE,
+                              thread_name_prefix='owm-fetch')
+
+# Every request in the process draws from one budget, see set_quota
+budget = RequestBudget()
+
+
+class RateLimited(requests.RequestException):
+    """ Upstream answered 429 Too Many Requests """
+
+    def __init__(self, retry_after=None, message='Rate limited by OpenWeatherMap'):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExhausted(RateLimited):
+    """ Shed by the local request budget before it was sent """
+
+    def __init__(self, retry_after=None):
+        super().__init__(retry_after, 'Local OpenWeatherMap quota used up')
+
+
+def retry_after(response):
+    """ Seconds from a Retry-After header, None when absent or an HTTP date """
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def set_base_url(base_url=None):
+    """ Send every request to `base_url`, e.g. a local owm_standin, or back upstream """
+    global API_BASE_URL, ICON_BASE_URL
+    API_BASE_URL = (base_url or DEFAULT_API_BASE_URL).rstrip('/')
+    ICON_BASE_URL = (base_url or DEFAULT_ICON_BASE_URL).rstrip('/')
+
+
+def set_quota(calls_per_minute=0, calls_per_day=0):
+    """ Limit the calls this process makes with the API key, 0 for no limit """
+    budget.configure(calls_per_minute, calls_per_day)
+
+
+def get(kind, url, params=None, headers=None, priority=USER):
+    """ GET through the shared keep-alive session with the timeout for `kind`
+
+    Raises QuotaExhausted when the request budget has no room for it.
+    """
+    try:
+        budget.acquire(QUOTA_COST[kind], priority)
+    except OverBudget as exc:
+        raise QuotaExhausted(exc.retry_after) from None
+    with metrics.span('http', endpoint=kind):
+        response = session.get(url, params=params, headers=headers,
+                               timeout=TIMEOUTS[kind])
+    metrics.count('http_responses', endpoint=kind, status=response.status_code)
+    if response.status_code == 429 and QUOTA_COST[kind]:
+        # The key is shared with other hosts, pause every request here too
+        budget.backoff(retry_after(response))
+    return response
+
+
+def decode_json(kind, response):
+    with metrics.span('json_decode', endpoint=kind):
+        return response.json()
+
+
+def geocode(city, api_key, geocode_cache=None, gazetteer=None, priority=USER):
+    """ Resolve a city to (lat, lon): geocode cache, offline gazetteer, then the network """
+    with metrics.span('geocode'):
+        if geocode_cache is not None:
+            coords = geocode_cache.get(city)
+            if coords:
+                metrics.cache('geocode', 'hit')
+                return coords
+            metrics.cache('geocode', 'miss')
+        if gazetteer is not None:
+            coords = gazetteer.resolve(city)
+            metrics.cache('gazetteer', 'hit' if coords else 'miss')
+            if coords:
+                return coords
+
+        geo_response = get('geocode', f'{API_BASE_URL}/geo/1.0/direct',
+                           {'q': city, 'limit': 1, 'appid': api_key}, priority=priority)
+        if geo_response.status_code == 429:
+            raise RateLimited(retry_after(geo_response))
+        if geo_response.status_code != 200:
+            return None
+        geo_results = decode_json('geocode', geo_response)
+        if not geo_results:
+            return None
+
+        coords = (geo_results[0]['lat'], geo_results[0]['lon'])
+        if geocode_cache is not None:
+            geocode_cache.put(city, *coords)
+        return coords
+
+
+def get_weather(lat, lon, api_key, headers=None, priority=USER):
+    return get('weather', f'{API_BASE_URL}/data/2.5/weather',
+               {'lat': lat, 'lon': lon, 'appid': api_key, 'units': 'metric'},
+               headers, priority)
+
+
+def get_forecast(lat, lon, api_key, headers=None, priority=USER):
+    return get('forecast', f'{API_BASE_URL}/data/2.5/forecast',
+               {'lat': lat, 'lon': lon, 'appid': api_key, 'units': 'metric'},
+               headers, priority)
+
+
+def fetch_icon(icon_code, variant=''):
+    icon_response = get('icon',
+                        f'{ICON_BASE_URL}/img/wn/{icon_code}{variant}.png')
+    if icon_response.status_code != 200:
+        return None
+    return icon_response.content
+
+
+def submit_icons(keys, icon_store=None):
+    """ Start downloads for the (icon_code, variant) keys missing from the store """
+    futures = {}
+    for key in keys:
+        if icon_store is not None and icon_store.has(*key):
+            metrics.cache('icon_disk', 'hit')
+            continue
+        metrics.cache('icon_disk', 'miss')
+        futures[key] = executor.submit(fetch_icon, *key)
+    return futures
+
+
+def collect_icons(futures, icon_store=None):
+    """ Wait for submit_icons downloads and persist the ones that succeeded """
+    icons = {}
+    for key, future in futures.items():
+        try:
+            data = future.result()
+        except requests.RequestException:
+            # A missing icon shouldn't fail the refresh, e.g. when offline
+            continue
+        if data is None:
+            continue
+        icons[key] = data
+        if icon_store is not None:
+            icon_store.put(*key, data)
+    return icons
+
+
+def cancel(futures):
+    """ Drop queued requests once the refresh has already failed """
+    for future in futures:
+        future.cancel()
@@ -0,0 +1,346 @@
+""" Local OpenWeatherMap stand-in for offline latency and load testing
+
+Serves /geo/1.0/direct, /data/2.5/weather, /data/2.5/forecast and
+/img/wn/*.png from recorded fixtures, with injectable latency, jitter,
+errors and 429 rate limiting. Point the app at it with
+
+    [openweathermap]
+    base_url = http://127.0.0.1:8765
+
+    python scripts/owm_standin.py --port 8765 --latency 80 --jitter 30
+    python scripts/owm_standin.py --record --api-key KEY   # refresh fixtures
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+DEFAULT_FIXTURES = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'fixtures', 'owm'))
+UPSTREAM_API_URL = 'http://api.openweathermap.org'
+UPSTREAM_ICON_URL = 'http://openweathermap.org'
+
+ENDPOINTS = {
+    '/geo/1.0/direct': 'geo',
+    '/data/2.5/weather': 'weather',
+    '/data/2.5/forecast': 'forecast',
+}
+ICON_PATH = re.compile(r'^/img/wn/(?P<name>[0-9a-z]+(@2x)?)\.png$')
+
+FORECAST_STEP = 3 * 3600
+
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0.0
+    # Requests per minute before answering 429, 0 for unlimited
+    rate_limit: int = 0
+    seed: int = None
+
+
+def fixture_key(endpoint, params):
+    """ File name a request is recorded under, e.g. geo/london_uk.json """
+    if endpoint == 'geo':
+        query = params.get('q', [''])[0].strip().lower()
+        return re.sub(r'[^a-z0-9]+', '_', query).strip('_') or 'default'
+    try:
+        return f"{float(params['lat'][0]):.2f}_{float(params['lon'][0]):.2f}"
+    except (KeyError, ValueError):
+        return 'default'
+
+
+def placeholder_png(name):
+    """ A flat-colour PNG for icon codes that have no recorded fixture """
+    size = 100 if name.endswith('@2x') else 50
+    rgb = hashlib.md5(name.encode()).digest()[:3]
+    row = b'\x00' + rgb * size
+    raw = row * size
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw))
+            + chunk(b'IEND', b''))
+
+
+def shift_times(endpoint, payload, now=None):
+    """ Move recorded timestamps so replayed data looks current
+
+    The forecast is rebased so its first slot is the current 3-hour slot,
+    current weather so it was observed in the last ten minutes.
+    """
+    now = int(now if now is not None else time.time())
+    if endpoint == 'forecast' and payload.get('list'):
+        shift = now - now % FORECAST_STEP - payload['list'][0]['dt']
+        for entry in payload['list']:
+            entry['dt'] += shift
+            entry['dt_txt'] = datetime.fromtimestamp(
+                entry['dt'], timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        city = payload.get('city', {})
+    elif endpoint == 'weather' and 'dt' in payload:
+        shift = now - now % 600 - payload['dt']
+        payload['dt'] += shift
+        city = payload.get('sys', {})
+    else:
+        return payload
+    for field in ('sunrise', 'sunset'):
+        if field in city:
+            city[field] += shift
+    return payload
+
+
+class FixtureStore:
+    """ Recorded responses on disk, falling back to <endpoint>/default.json """
+
+    def __init__(self, directory=DEFAULT_FIXTURES):
+        self.directory = directory
+
+    def _path(self, endpoint, key):
+        return os.path.join(self.directory, endpoint, f'{key}.json')
+
+    def load(self, endpoint, key):
+        for name in (key, 'default'):
+            try:
+                with open(self._path(endpoint, name), encoding='utf-8') as fixture:
+                    return json.load(fixture)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def save(self, endpoint, key, payload):
+        os.makedirs(os.path.join(self.directory, endpoint), exist_ok=True)
+        with open(self._path(endpoint, key), 'w', encoding='utf-8') as fixture:
+            json.dump(payload, fixture, indent=2, ensure_ascii=False)
+
+    def load_icon(self, name):
+        try:
+            with open(os.path.join(self.directory, 'img', f'{name}.png'), 'rb') as icon:
+                return icon.read()
+        except FileNotFoundError:
+            return None
+
+    def save_icon(self, name, data):
+        os.makedirs(os.path.join(self.directory, 'img'), exist_ok=True)
+        with open(os.path.join(self.directory, 'img', f'{name}.png'), 'wb') as icon:
+            icon.write(data)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = 'owm-standin/1.0'
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        endpoint = ENDPOINTS.get(url.path)
+        icon = ICON_PATH.match(url.path)
+        kind = endpoint or ('icon' if icon else 'unknown')
+        self.server.count(kind)
+
+        self.server.inject_latency()
+        if endpoint and self.server.rate_limited():
+            return self.send_json(429, {
+                'cod': 429,
+                'message': 'Your account is temporary blocked due to exceeding '
+                           'of requests limitation of your subscription type.'})
+        if self.server.inject_error():
+            return self.send_json(500, {'cod': 500, 'message': 'Internal error'})
+
+        if endpoint:
+            payload = self.server.api_payload(endpoint, url.path, params)
+            if payload is None:
+                return self.send_json(404, {'cod': '404', 'message': 'city not found'})
+            return self.send_json(200, payload)
+        if icon:
+            data = self.server.icon_data(icon.group('name'))
+            return self.send_body(200, data, 'image/png')
+        return self.send_json(404, {'cod': '404', 'message': 'Not found'})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_body(status, body, 'application/json; charset=utf-8')
+
+    def send_body(self, status, body, content_type):
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandinServer(ThreadingHTTPServer):
+    """ The stand-in HTTP server, usable from the CLI or started in-process by tools """
+
+    daemon_threads = True
+
+    def __init__(self, port=8765, host='127.0.0.1', fixtures=None, faults=None,
+                 record_api_key=None, shift=True, verbose=False):
+        super().__init__((host, port), StandinHandler)
+        self.fixtures = fixtures or FixtureStore()
+        self.faults = faults or FaultProfile()
+        self.record_api_key = record_api_key
+        self.shift = shift
+        self.verbose = verbose
+        self.requests = Counter()
+        self._random = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """ Serve from a daemon thread, for benchmarks and soak tests """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def inject_latency(self):
+        with self._lock:
+            delay = self.faults.latency_ms + self._random.uniform(
+                -self.faults.jitter_ms, self.faults.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def inject_error(self):
+        with self._lock:
+            return self._random.random() < self.faults.error_rate
+
+    def rate_limited(self):
+        if not self.faults.rate_limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.faults.rate_limit:
+                return True
+            self._recent.append(now)
+            return False
+
+    def api_payload(self, endpoint, path, params):
+        key = fixture_key(endpoint, params)
+        if self.record_api_key:
+            payload = self._record(endpoint, key, path, params)
+        else:
+            payload = self.fixtures.load(endpoint, key)
+        if payload is not None and self.shift:
+            payload = shift_times(endpoint, payload)
+        return payload
+
+    def icon_data(self, name):
+        data = self.fixtures.load_icon(name)
+        if data is None and self.record_api_key:
+            data = self._fetch(f'{UPSTREAM_ICON_URL}/img/wn/{name}.png')
+            if data is not None:
+                self.fixtures.save_icon(name, data)
+        return data or placeholder_png(name)
+
+    def _record(self, endpoint, key, path, params):
+        query = {name: values[0] for name, values in params.items()}
+        query['appid'] = self.record_api_key
+        body = self._fetch(f'{UPSTREAM_API_URL}{path}?{urlencode(query)}')
+        if body is None:
+            return self.fixtures.load(endpoint, key)
+        payload = json.loads(body)
+        self.fixtures.save(endpoint, key, payload)
+        return payload
+
+    @staticmethod
+    def _fetch(url):
+        try:
+            with urllib.request.urlopen(url, timeout=15) as response:
+                return response.read()
+        except (urllib.error.URLError, OSError):
+            return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve recorded OpenWeatherMap responses locally.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES,
+                        help='Directory of recorded responses')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Added latency per request in ms')
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='Uniform +/- jitter on the latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--rate-limit', type=int, default=0,
+                        help='API calls per minute before answering 429')
+    parser.add_argument('--seed', type=int, help='Seed for jitter and errors')
+    parser.add_argument('--no-shift', action='store_true',
+                        help='Replay recorded timestamps as-is')
+    parser.add_argument('--record', action='store_true',
+                        help='Proxy to OpenWeatherMap and save what comes back')
+    parser.add_argument('--api-key', help='Upstream API key used with --record')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.record and not args.api_key:
+        parser.error('--record needs --api-key')
+
+    server = StandinServer(
+        args.port, args.host, FixtureStore(args.fixtures),
+        FaultProfile(args.latency, args.jitter, args.error_rate,
+                     args.rate_limit, args.seed),
+        record_api_key=args.api_key if args.record else None,
+        shift=not args.no_shift, verbose=args.verbose)
+    print(f'OpenWeatherMap stand-in listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import random
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from response_cache import FORECAST_CADENCE, FORECAST_PUBLISH_DELAY, seconds_until_next_run
+
+# Share of each delay randomized either way
+JITTER = 0.1
+# QTimer's default coarse timers may fire up to 5% early
+TIMER_SLACK = 0.05
+
+
+def earliest_refresh(interval, jitter=JITTER):
+    """ Shortest delay between two successful refreshes while visible
+
+    Current weather cached for longer would be served again by an early
+    tick, leaving it a whole interval older than the configured refresh.
+    """
+    return interval * (1 - jitter) * (1 - TIMER_SLACK)
+
+
+class AdaptiveRefreshTimer(QObject):
+    """ Single-shot refresh timer that adapts to visibility, errors and upstream cadence
+
+    Only one refresh is ever pending: the timer re-arms when the owner reports
+    the fetch finished, never while one is in flight. Every delay is jittered
+    so a fleet rebooted together drifts apart, stretched while the window is
+    hidden, backed off exponentially on errors and 429s, and, with
+    `align_to_forecast` for owners that refresh the forecast, pulled in to
+    land just after the next 3-hourly forecast run.
+    """
+
+    timeout = pyqtSignal()
+
+    def __init__(self, interval, parent=None, jitter=JITTER, hidden_factor=4,
+                 max_backoff=3600, error_retry=60, align_to_forecast=True):
+        super().__init__(parent)
+        self.interval = interval
+        self.jitter = jitter
+        self.align_to_forecast = align_to_forecast
+        # 0 pauses refreshing entirely while hidden
+        self.hidden_factor = hidden_factor
+        self.max_backoff = max_backoff
+        self.error_retry = error_retry
+        self.visible = True
+        self.in_flight = False
+        self.failures = 0
+        self.last_success = None
+        self._random = random.Random()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    def start(self):
+        # Random first offset so instances started together don't stay in step
+        self._arm(self._random.uniform(0, self.interval * self.jitter) + self.interval)
+
+    def stop(self):
+        self._timer.stop()
+
+    def isActive(self):
+        return self._timer.isActive()
+
+    def remaining(self):
+        return self._timer.remainingTime() / 1000 if self._timer.isActive() else None
+
+    def set_interval(self, interval):
+        self.interval = interval
+        if not self.in_flight:
+            self._arm(self.next_delay())
+
+    def earliest_refresh(self):
+        return earliest_refresh(self.interval, self.jitter)
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        if self.in_flight:
+            return
+        if not visible:
+            self._arm(self.next_delay())
+        elif self._overdue():
+            # Catch up right away instead of showing stale data
+            self._arm(0.5)
+        else:
+            # Back on the normal schedule, counted from the last refresh
+            elapsed = time.monotonic() - self.last_success
+            self._arm(min(self.next_delay(), self.interval - elapsed))
+
+    def fetch_started(self):
+        """ Any fetch, timer-driven or user-initiated, resets the schedule """
+        self.in_flight = True
+        self._timer.stop()
+
+    def fetch_finished(self, success, rate_limited=False, retry_after=None):
+        self.in_flight = False
+        if success:
+            self.failures = 0
+            self.last_success = time.monotonic()
+            self._arm(self.next_delay())
+            return
+
+        self.failures += 1
+        # Errors retry soon and double up; 429s start from the full interval
+        base = self.interval if rate_limited else min(self.error_retry, self.interval)
+        delay = min(self.max_backoff, base * 2 ** (self.failures - 1))
+        if retry_after:
+            delay = max(delay, retry_after)
+        self._arm(self._jittered(delay))
+
+    def next_delay(self):
+        """ Seconds until the next refresh after a successful one, or None to pause """
+        if not self.visible:
+            if not self.hidden_factor:
+                return None
+            return self._jittered(self.interval * self.hidden_factor)
+
+        delay = self._jittered(self.interval)
+        if not self.align_to_forecast or self.interval >= FORECAST_CADENCE:
+            # A run always falls within a longer interval, aligning would
+            # shorten every one of them to the cadence
+            return delay
+        # Land shortly after a new forecast run rather than up to an interval later
+        until_run = seconds_until_next_run() + self._random.uniform(
+            0, min(self.interval, FORECAST_PUBLISH_DELAY))
+        return min(delay, until_run)
+
+    def _overdue(self):
+        return (self.last_success is None
+                or time.monotonic() - self.last_success >= self.interval)
+
+    def _jittered(self, delay):
+        return delay * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _arm(self, delay):
+        self._timer.stop()
+        if delay is not None:
+            self._timer.start(max(0, int(delay * 1000)))
+
+    def _fire(self):
+        self.timeout.emit()
+        if not self.in_flight:
+            # The owner had nothing to refresh, keep the schedule going
+            self._arm(self.next_delay())
@@ -0,0 +1,159 @@
+""" Client-side OpenWeatherMap quota: token buckets shared by every request
+
+Each configured limit (calls per minute, calls per day) is a token bucket
+that refills continuously. A quarter of every bucket is held back for
+user searches: background refreshes only run while more than that is
+left, wait briefly when it's nearly there, and are shed otherwise. After
+upstream answers 429 everything pauses until its Retry-After has passed.
+
+Qt-free and thread-safe, requests are made from worker and executor threads.
+"""
+import threading
+import time
+
+from metrics import metrics
+
+USER = 'user'
+BACKGROUND = 'background'
+
+# Share of each bucket only user searches may use
+USER_RESERVE = 0.25
+# Longest a request blocks its thread for a token before it is shed
+MAX_WAIT = {USER: 10.0, BACKGROUND: 2.0}
+# Pause after a 429 that didn't say for how long
+DEFAULT_BACKOFF = 60.0
+
+WINDOWS = (('minute', 60), ('day', 24 * 3600))
+
+
+class OverBudget(Exception):
+    """ No token within the wait allowed for the request's priority """
+
+    def __init__(self, retry_after):
+        super().__init__(f'Request budget exhausted, retry in {retry_after:.0f} s')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, name, capacity, period, now=None):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / period  # Tokens per second
+        self.tokens = float(capacity)
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost, floor=0.0):
+        """ Seconds until `cost` tokens can be taken with `floor` tokens left over """
+        missing = floor + cost - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+class RequestBudget:
+    """ Grants, delays or sheds API calls against the configured limits """
+
+    def __init__(self, calls_per_minute=0, calls_per_day=0):
+        self._lock = threading.Condition()
+        self._buckets = []
+        self._blocked_until = 0.0
+        self._users_waiting = 0
+        self._outcomes = {}
+        self.configure(calls_per_minute, calls_per_day)
+
+    def configure(self, calls_per_minute=0, calls_per_day=0):
+        """ Set the limits, 0 disables one; tokens already spent stay spent """
+        now = time.monotonic()
+        limits = dict(zip((name for name, _ in WINDOWS), (calls_per_minute, calls_per_day)))
+        with self._lock:
+            old = {bucket.name: bucket for bucket in self._buckets}
+            buckets = []
+            for name, period in WINDOWS:
+                if limits[name] <= 0:
+                    continue
+                bucket = TokenBucket(name, limits[name], period, now)
+                if name in old:
+                    old[name].refill(now)
+                    bucket.tokens = min(bucket.capacity, old[name].tokens)
+                buckets.append(bucket)
+            self._buckets = buckets
+            self._lock.notify_all()
+
+    def acquire(self, cost=1, priority=USER):
+        """ Take `cost` tokens, waiting up to MAX_WAIT[priority]; raises OverBudget """
+        if cost <= 0:
+            with self._lock:
+                self._record(priority, 'free')
+            return
+        deadline = time.monotonic() + MAX_WAIT[priority]
+        delayed = False
+        with self._lock:
+            if priority == USER:
+                self._users_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(cost, priority, now)
+                    if wait == 0:
+                        for bucket in self._buckets:
+                            bucket.tokens -= cost
+                        self._record(priority, 'delayed' if delayed else 'granted')
+                        self._publish()
+                        return
+                    if now + wait > deadline:
+                        self._record(priority, 'shed')
+                        raise OverBudget(wait)
+                    delayed = True
+                    self._lock.wait(wait)
+            finally:
+                if priority == USER:
+                    self._users_waiting -= 1
+                    self._lock.notify_all()
+
+    def backoff(self, seconds=None):
+        """ Upstream said 429: hold every request until `seconds` have passed """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until,
+                                      time.monotonic() + (seconds or DEFAULT_BACKOFF))
+
+    def usage(self):
+        """ {'limits': {'minute': {'limit', 'available'}, ...}, 'blocked_for', 'requests'} """
+        now = time.monotonic()
+        with self._lock:
+            for bucket in self._buckets:
+                bucket.refill(now)
+            return {
+                'limits': {bucket.name: {'limit': bucket.capacity,
+                                         'available': bucket.tokens}
+                           for bucket in self._buckets},
+                'blocked_for': max(0.0, self._blocked_until - now),
+                'requests': {f'{priority}/{outcome}': count
+                             for (priority, outcome), count in self._outcomes.items()},
+            }
+
+    def _wait_time(self, cost, priority, now):
+        wait = max(0.0, self._blocked_until - now)
+        for bucket in self._buckets:
+            bucket.refill(now)
+            floor = 0.0
+            if priority == BACKGROUND:
+                # A budget too small to hold a reserve would shed every refresh
+                floor = max(0.0, min(bucket.capacity * USER_RESERVE, bucket.capacity - cost))
+            wait = max(wait, bucket.wait_time(cost, floor))
+        if priority == BACKGROUND and self._users_waiting and wait == 0:
+            # Let the waiting searches have the next tokens
+            wait = 0.05
+        return wait
+
+    def _record(self, priority, outcome):
+        key = (priority, outcome)
+        self._outcomes[key] = self._outcomes.get(key, 0) + 1
+        metrics.count('api_quota_requests', priority=priority, result=outcome)
+
+    def _publish(self):
+        for bucket in self._buckets:
+            metrics.gauge('api_quota_available', round(bucket.tokens, 1), window=bucket.name)
+            metrics.gauge('api_quota_limit', bucket.capacity, window=bucket.name)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Seconds a payload is served without asking upstream again. The forecast
+# only moves on the 3-hour model cadence, current weather every ~10 minutes
+DEFAULT_TTLS = {
+    'weather': 600,
+    'forecast': 3 * 3600,
+}
+
+# A new forecast run is published every 3 hours, a few minutes after the
+# hour; a forecast fetched before the latest run is stale whatever its age
+FORECAST_CADENCE = 3 * 3600
+FORECAST_PUBLISH_DELAY = 5 * 60
+CADENCES = {'forecast': FORECAST_CADENCE}
+
+# A forecast payload is ~15 KB on the wire and several times that as
+# parsed JSON; these bound a dashboard or a long search history
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def last_run(cadence, now=None):
+    """ Timestamp of the most recent publication on a `cadence` second schedule """
+    now = now if now is not None else time.time()
+    return (now - FORECAST_PUBLISH_DELAY) // cadence * cadence + FORECAST_PUBLISH_DELAY
+
+
+def seconds_until_next_run(cadence=FORECAST_CADENCE, now=None):
+    now = now if now is not None else time.time()
+    return last_run(cadence, now) + cadence - now
+
+
+@dataclass
+class CachedResponse:
+    payload: object
+    fetched_at: float
+    etag: str = None
+    last_modified: str = None
+    size: int = 0  # Response body size, what the byte budget counts
+
+    def age(self, now=None):
+        return (now or time.time()) - self.fetched_at
+
+
+class ResponseCache:
+    """ Last good OpenWeatherMap payloads keyed by (endpoint, lat, lon, units)
+
+    Least recently used entries are dropped past `max_entries` or once the
+    stored response bodies add up to more than `max_bytes`.
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._max_ttls = dict(self.ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(endpoint, lat, lon, units='metric'):
+        # Round so float noise from different geocode paths hits the same entry
+        return (endpoint, round(lat, 4), round(lon, 4), units)
+
+    def get(self, endpoint, lat, lon, units='metric'):
+        key = self.key(endpoint, lat, lon, units)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def limit_ttl(self, endpoint, seconds):
+        """ Serve `endpoint` from cache for at most `seconds`, never past its configured TTL """
+        self.ttls[endpoint] = min(self._max_ttls[endpoint], seconds)
+
+    def is_fresh(self, endpoint, entry):
+        if entry is None or entry.age() >= self.ttls.get(endpoint, 0):
+            return False
+        cadence = CADENCES.get(endpoint)
+        return cadence is None or entry.fetched_at >= last_run(cadence)
+
+    def put(self, endpoint, lat, lon, payload, headers=None, units='metric', size=0):
+        headers = headers or {}
+        entry = CachedResponse(payload, time.time(), headers.get('ETag'),
+                               headers.get('Last-Modified'), size)
+        key = self.key(endpoint, lat, lon, units)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self._entries[key] = entry
+            self.bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self.bytes > self.max_bytes):
+                self.bytes -= self._entries.popitem(last=False)[1].size
+        return entry
+
+    def touch(self, endpoint, lat, lon, units='metric'):
+        """ Restart the TTL of an entry the server confirmed with 304 Not Modified """
+        with self._lock:
+            entry = self._entries.get(self.key(endpoint, lat, lon, units))
+            if entry is not None:
+                entry.fetched_at = time.time()
+            return entry
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
@@ -0,0 +1,61 @@
+""" Last successfully rendered weather, persisted so a launch can paint before any I/O
+
+Only light modules are imported here: loading a snapshot must not pull in
+requests or the HTTP client, which is what makes the first frame cheap.
+Icons are not stored, the codes in the data resolve against the IconStore.
+"""
+import json
+import time
+
+from app_paths import atomic_write
+from forecast_model import ForecastSeries
+from weather_result import WeatherResult
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path, result):
+    """ Atomically write the parts of `result` needed to render it again """
+    data = {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': time.time(),
+        'city': result.city,
+        'lat': result.lat,
+        'lon': result.lon,
+        'weather': result.weather,
+        'forecast': result.forecast.to_dict() if result.forecast is not None else None,
+    }
+    try:
+        atomic_write(path, json.dumps(data, separators=(',', ':')))
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load_snapshot(path, city=None, now=None):
+    """ The saved WeatherResult, or None when missing, unreadable or for another city
+
+    Hourly and daily rows are recomputed for `now`, and `stale_age` is set
+    to the snapshot's age.
+    """
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            data = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != SNAPSHOT_VERSION or not data.get('weather'):
+        return None
+    if city is not None and data.get('city') != city:
+        return None
+
+    now = now if now is not None else time.time()
+    result = WeatherResult(city=data['city'], lat=data.get('lat'),
+                           lon=data.get('lon'), weather=data['weather'],
+                           stale_age=max(0.0, now - data['saved_at']))
+    try:
+        if data.get('forecast'):
+            result.forecast = ForecastSeries.from_dict(data['forecast'])
+            result.hourly = result.forecast.next_slots(5, now)
+            result.daily = result.forecast.daily(5)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        result.forecast, result.hourly, result.daily = None, [], []
+    return result
@@ -0,0 +1,175 @@
+""" Soak test: thousands of refresh cycles offline, failing if memory keeps growing
+
+Drives a real WeatherApp under Qt's offscreen platform against an
+in-process owm_standin, rotating through cities, expiring the response
+cache so every cycle goes upstream, injecting upstream errors and opening
+the settings dialog now and then:
+
+    python scripts/soak_test.py --cycles 5000
+    python scripts/soak_test.py --cycles 20000 --max-rss-growth 8 --output soak.json
+
+Memory is sampled after a warm-up, once caches and pools have filled up;
+from there on RSS, live Qt objects and Python objects should stay flat.
+Exits non-zero when any of them grew past its threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QCoreApplication, QEvent, QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import owm_client  # noqa: E402
+from app_config import write_config  # noqa: E402
+from config_service import ConfigService  # noqa: E402
+from owm_standin import FaultProfile, StandinServer  # noqa: E402
+
+
+class Soak:
+    def __init__(self, args):
+        self.args = args
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self._tmp = tempfile.TemporaryDirectory(prefix='weatherapp-soak-')
+        # Keep the user's caches, snapshot and history out of it
+        os.environ['XDG_CACHE_HOME'] = os.environ['XDG_DATA_HOME'] = self._tmp.name
+        self.cities = [f'Soak City {i}' for i in range(args.cities)]
+        self.samples = []
+
+    def pump_until(self, done, timeout=30):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > deadline:
+                raise TimeoutError('soak cycle did not finish')
+            self.app.processEvents()
+            time.sleep(0.0005)
+
+    def new_window(self, base_url):
+        import main_BC
+
+        path = os.path.join(self._tmp.name, 'config', 'config.ini')
+        # A long interval, the soak loop drives the refreshes itself, and
+        # no quota, it makes thousands of requests to the stand-in
+        write_config(path, api_key='soak', base_url=base_url,
+                     city_location=self.cities[0], update_interval=24 * 3600,
+                     calls_per_minute=0)
+        window = main_BC.WeatherApp(ConfigService(path, watch=False))
+        self.pump_until(lambda: window.fetch_generation and not window.fetch_in_flight)
+        # Distinct coordinates per city so every one has its own cache entries
+        for i, city in enumerate(self.cities):
+            window.weather_service.geocode_cache.put(city, 40 + i * 0.05, -3 + i * 0.05)
+        return window
+
+    def cycle(self, window, n):
+        response_cache = window.weather_service.response_cache
+        for entry in list(response_cache._entries.values()):
+            entry.fetched_at -= 24 * 3600
+
+        if n % self.args.settings_every == 0:
+            # The dialog is modal, close it as soon as its event loop runs
+            QTimer.singleShot(0, lambda: QApplication.activeModalWidget().reject())
+            window.open_settings()
+        if n % self.args.search_every == 0:
+            window.city_input.setText(self.cities[n // self.args.search_every
+                                                  % len(self.cities)])
+            window.show_weather()
+        else:
+            window.refresh_weather()
+        self.pump_until(lambda: not window.fetch_in_flight)
+
+    def sample(self, window, n):
+        # Let deleteLater() and the cycle collector run before measuring
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        self.app.processEvents()
+        gc.collect()
+        report = window.memory_report(python_objects=True)
+        report['cycle'] = n
+        self.samples.append(report)
+        print(f"cycle {n:>7}  rss {report['rss_bytes'] / 2 ** 20:8.1f} MB  "
+              f"qt {report['qt_widgets']:>5} widgets {report['qt_objects']:>6} objects  "
+              f"python {report['python_objects']:>8}", flush=True)
+
+    def run(self):
+        args = self.args
+        server = StandinServer(
+            0, faults=FaultProfile(args.latency, error_rate=args.error_rate, seed=1)).start()
+        owm_client.set_base_url(server.url)
+        try:
+            window = self.new_window(server.url)
+            window.show()
+            started = time.perf_counter()
+            every = max(1, (args.cycles - args.warmup) // args.samples)
+            for n in range(1, args.cycles + 1):
+                self.cycle(window, n)
+                if n >= args.warmup and (n - args.warmup) % every == 0:
+                    self.sample(window, n)
+            elapsed = time.perf_counter() - started
+            window.timer.stop()
+            window.close()
+        finally:
+            server.stop()
+        return self.verdict(elapsed)
+
+    def verdict(self, elapsed):
+        args = self.args
+        first, last = self.samples[0], self.samples[-1]
+        growth = {key: last[key] - first[key]
+                  for key in ('rss_bytes', 'qt_widgets', 'qt_objects', 'python_objects')}
+        limits = {'rss_bytes': args.max_rss_growth * 2 ** 20,
+                  'qt_widgets': args.max_qt_growth,
+                  'qt_objects': args.max_qt_growth,
+                  'python_objects': args.max_python_growth}
+        failed = [key for key, limit in limits.items() if growth[key] > limit]
+
+        print(f"\n{args.cycles} cycles in {elapsed:.1f} s, growth after cycle {first['cycle']}:")
+        for key, limit in limits.items():
+            print(f"  {key:<16}{growth[key]:>+14,}  (limit {limit:,})"
+                  f"{'  FAIL' if key in failed else ''}")
+        print('FAIL' if failed else 'PASS')
+        return {'cycles': args.cycles, 'elapsed': elapsed, 'growth': growth,
+                'limits': limits, 'failed': failed, 'samples': self.samples}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run WeatherApp refresh cycles offline and fail on memory growth.')
+    parser.add_argument('--cycles', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200,
+                        help='Cycles before the first sample, while caches fill up')
+    parser.add_argument('--samples', type=int, default=10,
+                        help='Memory samples taken after the warm-up')
+    parser.add_argument('--cities', type=int, default=20,
+                        help='Distinct cities the searches rotate through')
+    parser.add_argument('--search-every', type=int, default=5,
+                        help='Every Nth cycle is a user search instead of a timer refresh')
+    parser.add_argument('--settings-every', type=int, default=50,
+                        help='Open and cancel the settings dialog every N cycles')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Stand-in latency per request in ms')
+    parser.add_argument('--error-rate', type=float, default=0.02,
+                        help='Share of stand-in requests answered with a 500')
+    parser.add_argument('--max-rss-growth', type=float, default=16,
+                        help='Allowed RSS growth in MB after the warm-up')
+    parser.add_argument('--max-qt-growth', type=int, default=0,
+                        help='Allowed growth in live Qt widgets and objects')
+    parser.add_argument('--max-python-growth', type=int, default=5000,
+                        help='Allowed growth in Python objects tracked by gc')
+    parser.add_argument('--output', help='Write the samples and verdict as JSON')
+    args = parser.parse_args(argv)
+    if args.cycles <= args.warmup:
+        parser.error('--cycles must be larger than --warmup')
+
+    result = Soak(args).run()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(result, output, indent=2)
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,35 +1,267 @@
+import re
+import shutil
 import subprocess
+from collections import deque
 
-from PyQt5.QtWidgets import QDialog, QMessageBox, QPushButton, QVBoxLayout
+from PyQt5.QtCore import QObject, QProcess, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QDialog, QLabel, QMessageBox, QPlainTextEdit,
+                             QProgressBar, QPushButton, QVBoxLayout)
+
+# Package and binary name -> button label; add new terminals here
+UTILITIES = {
+    'alacritty': 'Alacritty',
+    'kitty': 'Kitty',
+    'wezterm': 'WezTerm',
+}
+
+# A package database query should take milliseconds, don't hang the dialog on it
+RPM_TIMEOUT = 5
+
+# zypper is chatty, keep only the tail of a long session in the log pane
+LOG_LINES = 5000
+
+_installed = None
+
+
+def installed_packages(names):
+    """ The subset of `names` the rpm database knows, from a single `rpm -q` """
+    try:
+        completed = subprocess.run(
+            ['rpm', '-q', '--queryformat', '%{NAME}\\n', *names],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            timeout=RPM_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        # Not an rpm system, the PATH scan has to do
+        return set()
+    # Installed ones print their name, the rest "package x is not installed"
+    return set(completed.stdout.splitlines()) & set(names)
+
+
+def installed_utilities():
+    """ Names from UTILITIES that are installed, detected once and cached
+
+    A binary on PATH counts as installed as well as a package in the rpm
+    database, so builds installed by hand are found too. Call
+    invalidate_installed() after installing or removing packages.
+    """
+    global _installed
+    if _installed is None:
+        names = list(UTILITIES)
+        on_path = {name for name in names if shutil.which(name)}
+        missing = [name for name in names if name not in on_path]
+        _installed = on_path | (installed_packages(missing) if missing else set())
+    return _installed
+
+
+def invalidate_installed():
+    global _installed
+    _installed = None
+
+
+COMMANDS = {
+    'install': ['sudo', 'zypper', '--non-interactive', 'install', '-y'],
+    'remove': ['sudo', 'zypper', '--non-interactive', 'remove', '-y'],
+}
+
+# zypper gets this long to release its lock after a cancel before it is killed
+KILL_AFTER_MS = 10000
+
+# "Retrieving: kitty-0.35.2 ... (2/3)", "(2/3) Installing: kitty-0.35.2 ..."
+STEP = re.compile(r'\((\d+)/(\d+)\)')
+
+
+class PackageJob:
+    def __init__(self, action, package):
+        self.action = action
+        self.package = package
+        self.cancelled = False
+
+    def __repr__(self):
+        return f'{self.action} {self.package}'
+
+
+def step_progress(line):
+    """ Percent done from a zypper step line, downloads first half; None if not one """
+    match = STEP.search(line)
+    if match is None:
+        return None
+    done, total = int(match.group(1)), int(match.group(2))
+    if not total:
+        return None
+    fraction = min(done / total, 1.0)
+    if line.lstrip().startswith('Retrieving'):
+        return int(50 * fraction)
+    if 'Installing' in line or 'Removing' in line:
+        return 50 + int(50 * fraction)
+    return None
+
+
+class PackageJobQueue(QObject):
+    """ zypper jobs run one at a time in the background with QProcess
+
+    The GUI thread never waits on the package manager, and only one zypper
+    holds the package lock at a time. stdout and stderr are merged and
+    reported line by line.
+    """
+
+    job_started = pyqtSignal(object)           # PackageJob
+    output = pyqtSignal(str)                   # One line, without the newline
+    progress = pyqtSignal(int)                 # Percent, -1 until zypper reports steps
+    job_finished = pyqtSignal(object, bool, str)  # PackageJob, ok, message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = deque()
+        self.current = None
+        self._process = None
+
+    def __len__(self):
+        return len(self.pending) + (self.current is not None)
+
+    def jobs(self):
+        """ The running job first, then the queued ones """
+        return ([self.current] if self.current is not None else []) + list(self.pending)
+
+    def submit(self, action, package):
+        job = PackageJob(action, package)
+        self.pending.append(job)
+        if self.current is None:
+            self._start_next()
+        return job
+
+    def cancel(self, job=None):
+        """ Cancel `job`, or the running one; queued jobs are just dropped """
+        job = job or self.current
+        if job is None:
+            return
+        if job is not self.current:
+            if job in self.pending:
+                self.pending.remove(job)
+                job.cancelled = True
+                self.job_finished.emit(job, False, f'{job} cancelled')
+            return
+        job.cancelled = True
+        process = self._process
+        process.terminate()
+        QTimer.singleShot(KILL_AFTER_MS, lambda: self._kill(process))
+
+    def cancel_all(self):
+        while self.pending:
+            self.cancel(self.pending[-1])
+        self.cancel()
+
+    def _start_next(self):
+        if not self.pending:
+            return
+        job = self.current = self.pending.popleft()
+        process = self._process = QProcess(self)
+        process.setProcessChannelMode(QProcess.MergedChannels)
+        process.readyReadStandardOutput.connect(self._read)
+        process.finished.connect(self._on_finished)
+        process.errorOccurred.connect(self._on_error)
+        self.job_started.emit(job)
+        self.progress.emit(-1)
+        command = COMMANDS[job.action] + [job.package]
+        self.output.emit('$ ' + ' '.join(command))
+        process.start(command[0], command[1:])
+
+    def _read(self):
+        process = self._process
+        while process.canReadLine():
+            line = bytes(process.readLine()).decode('utf-8', 'replace').rstrip()
+            self.output.emit(line)
+            percent = step_progress(line)
+            if percent is not None:
+                self.progress.emit(percent)
+
+    def _on_error(self, error):
+        # Without a started process finished() never comes
+        if error == QProcess.FailedToStart:
+            self._finish(False, f'Could not run {COMMANDS[self.current.action][0]}: '
+                                f'{self._process.errorString()}')
+
+    def _on_finished(self, exit_code, exit_status):
+        self._read()
+        remainder = bytes(self._process.readAll()).decode('utf-8', 'replace').rstrip()
+        if remainder:
+            self.output.emit(remainder)
+        job = self.current
+        if job.cancelled:
+            self._finish(False, f'{job} cancelled')
+        elif exit_status == QProcess.NormalExit and exit_code == 0:
+            done = 'installed' if job.action == 'install' else 'uninstalled'
+            self._finish(True, f'{job.package} {done} successfully!')
+        else:
+            self._finish(False, f'Failed to {job}. zypper exited with status {exit_code}')
+
+    def _finish(self, ok, message):
+        job, process = self.current, self._process
+        self.current = self._process = None
+        process.deleteLater()
+        if ok:
+            self.progress.emit(100)
+        self.job_finished.emit(job, ok, message)
+        self._start_next()
+
+    @staticmethod
+    def _kill(process):
+        try:
+            if process.state() != QProcess.NotRunning:
+                process.kill()
+        except RuntimeError:
+            pass  # Already finished and deleted
 
 
 class TerminalUtilitiesManager(QDialog):
     def __init__(self):
         super().__init__()
+        # One batched detection up front, the buttons then answer from the cache
+        installed_utilities()
+        # zypper runs in the background, one transaction at a time
+        self.jobs = PackageJobQueue(self)
+        self.jobs.job_started.connect(self.on_job_started)
+        self.jobs.output.connect(self.on_job_output)
+        self.jobs.progress.connect(self.on_job_progress)
+        self.jobs.job_finished.connect(self.on_job_finished)
+        self.closing = False
         self.initUI()
 
     def initUI(self):
         layout = QVBoxLayout()
 
-        # Add buttons for each terminal utility
-        alacritty_btn = QPushButton('Manage Alacritty', self)
-        kitty_btn = QPushButton('Manage Kitty', self)
-        wezterm_btn = QPushButton('Manage WezTerm', self)
+        # Add a button for each terminal utility
+        for utility_name, label in UTILITIES.items():
+            button = QPushButton(f'Manage {label}', self)
+            button.clicked.connect(
+                lambda _, utility_name=utility_name: self.manage_utility(utility_name))
+            layout.addWidget(button)
 
-        layout.addWidget(alacritty_btn)
-        layout.addWidget(kitty_btn)
-        layout.addWidget(wezterm_btn)
+        # Progress of the running job and zypper's output as it comes
+        self.status_label = QLabel('', self)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setVisible(False)
+        self.log = QPlainTextEdit(self)
+        self.log.setReadOnly(True)
+        self.log.setMaximumBlockCount(LOG_LINES)
+        self.log.setVisible(False)
+        self.cancel_btn = QPushButton('Cancel', self)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(lambda: self.jobs.cancel())
 
-        # Connect buttons to actions
-        alacritty_btn.clicked.connect(lambda: self.manage_utility("alacritty"))
-        kitty_btn.clicked.connect(lambda: self.manage_utility("kitty"))
-        wezterm_btn.clicked.connect(lambda: self.manage_utility("wezterm"))
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.log)
+        layout.addWidget(self.cancel_btn)
 
         # Set the layout
         self.setLayout(layout)
         self.setWindowTitle('Terminal Utilities Manager')
 
     def manage_utility(self, utility_name):
+        if any(job.package == utility_name for job in self.jobs.jobs()):
+            QMessageBox.information(
+                self, 'Busy', f'{utility_name} already has a job in the queue.')
+            return
         # Check if the utility is installed
         if self.is_installed(utility_name):
             response = QMessageBox.question(self, 'Uninstall?', f'{utility_name} is installed. Do you want to uninstall it?',
@@ -43,41 +275,75 @@ class TerminalUtilitiesManager(QDialog):
                 self.install_utility(utility_name)
 
     def is_installed(self, utility_name):
-        """Check if a utility is installed"""
-        try:
-            subprocess.run([utility_name, '--version'], check=True,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return True
-        except subprocess.CalledProcessError:
-            return False
-        except FileNotFoundError:
-            return False
+        """Check if a utility is installed, without starting it"""
+        return utility_name in installed_utilities()
 
     def install_utility(self, utility_name):
-        """Run the install command for the utility"""
-        try:
-            if utility_name == "alacritty":
-                subprocess.run(['sudo', 'zypper', 'install',
-                               '-y', 'alacritty'], check=True)
-            elif utility_name == "kitty":
-                subprocess.run(['sudo', 'zypper', 'install',
-                               '-y', 'kitty'], check=True)
-            elif utility_name == "wezterm":
-                subprocess.run(['sudo', 'zypper', 'install',
-                               '-y', 'wezterm'], check=True)
-            QMessageBox.information(
-                self, "Success", f"{utility_name} installed successfully!")
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Error", f"Failed to install {
-                                 utility_name}. Error: {str(e)}")
+        """Queue the install command for the utility"""
+        self.jobs.submit('install', utility_name)
+        self.update_status()
 
     def uninstall_utility(self, utility_name):
-        """Run the uninstall command for the utility"""
-        try:
-            subprocess.run(['sudo', 'zypper', 'remove',
-                           '-y', utility_name], check=True)
-            QMessageBox.information(
-                self, "Success", f"{utility_name} uninstalled successfully!")
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Error", f"Failed to uninstall {
-                                 utility_name}. Error: {str(e)}")
+        """Queue the uninstall command for the utility"""
+        self.jobs.submit('remove', utility_name)
+        self.update_status()
+
+    def update_status(self, message=None):
+        jobs = self.jobs.jobs()
+        if message is None and jobs:
+            message = f'Running: {jobs[0]}'
+            if len(jobs) > 1:
+                message += f" (queued: {', '.join(map(str, jobs[1:]))})"
+        if message is not None:
+            self.status_label.setText(message)
+        self.cancel_btn.setEnabled(bool(jobs))
+
+    def on_job_started(self, job):
+        self.log.setVisible(True)
+        self.progress_bar.setVisible(True)
+        self.update_status()
+
+    def on_job_output(self, line):
+        self.log.appendPlainText(line)
+
+    def on_job_progress(self, percent):
+        if percent < 0:
+            self.progress_bar.setRange(0, 0)  # Busy until zypper reports steps
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(percent)
+
+    def on_job_finished(self, job, ok, message):
+        # Even a failed or cancelled run may have changed what is installed
+        invalidate_installed()
+        if self.closing:
+            if not len(self.jobs):
+                super().reject()
+            return
+        self.log.appendPlainText(message)
+        if not len(self.jobs):
+            self.progress_bar.setVisible(False)
+            self.update_status(message)
+        else:
+            self.update_status()
+        if not ok and not job.cancelled:
+            QMessageBox.critical(self, "Error", message)
+
+    def reject(self):
+        if self.closing:
+            return  # Already waiting for zypper to stop
+        # Closing would kill zypper mid-transaction, ask first
+        if len(self.jobs):
+            response = QMessageBox.question(
+                self, 'Cancel?', 'Package changes are still running. Cancel them and close?',
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if response != QMessageBox.Yes:
+                return
+            self.closing = True
+            self.jobs.cancel_all()
+            if len(self.jobs):
+                # zypper gets time to release its lock, close once it has exited
+                self.update_status('Cancelling…')
+                self.cancel_btn.setEnabled(False)
+                return
+        super().reject()
@@ -0,0 +1,213 @@
+""" Optional per-host daemon: one fetcher and cache shared by every WeatherApp window
+
+Each subscribed city is fetched on its own adaptive schedule no matter how
+many windows follow it, so upstream traffic depends on the cities shown,
+not on the window count. Results are pushed to subscribers as they land:
+
+    python scripts/weather_daemon.py        # then set [daemon] enabled = true
+
+It reads the same config.ini as the app (API key, base URL, interval) and
+keeps watching it.
+"""
+import argparse
+import signal
+import sys
+
+from PyQt5.QtCore import QCoreApplication, QObject, QThreadPool, QTimer
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+import owm_client
+from app_config import CONFIG_PATH
+from app_paths import resource_path
+from config_service import ConfigService
+from daemon_client import (default_socket_path, encode_message, read_messages,
+                           resolve_socket_path)
+from geocode_cache import normalize_query
+from refresh_timer import AdaptiveRefreshTimer, earliest_refresh
+from request_budget import BACKGROUND, USER
+from weather_service import WeatherService
+from weather_worker import WeatherFetchWorker
+
+
+class Location(QObject):
+    """ One city, its refresh schedule, latest result and subscribed sockets """
+
+    def __init__(self, daemon, city):
+        super().__init__(daemon)
+        self.daemon = daemon
+        self.city = city
+        self.subscribers = set()
+        self.result = None
+        self.generation = 0
+        self.in_flight = False
+        settings = daemon.config.settings
+        # No window to hide, so only the error and cadence rules apply
+        self.timer = AdaptiveRefreshTimer(settings.update_interval, self)
+        self.timer.timeout.connect(self.fetch)
+
+    def fetch(self, priority=BACKGROUND):
+        if self.in_flight:
+            return
+        self.in_flight = True
+        self.generation += 1
+        self.timer.fetch_started()
+        worker = WeatherFetchWorker(self.daemon.service, self.city, self.generation,
+                                    priority=priority)
+        worker.signals.finished.connect(self.on_fetched)
+        self.daemon.thread_pool.start(worker)
+
+    def on_fetched(self, result):
+        if result.generation != self.generation:
+            return
+        if not result.revalidating:
+            self.in_flight = False
+            self.timer.fetch_finished(result.ok, result.rate_limited,
+                                      result.retry_after)
+        # Keep the last good data for new subscribers rather than an error
+        if self.result is None or not result.error:
+            self.result = result
+        self.publish(result)
+
+    def publish(self, result, sockets=None):
+        message = encode_message({'op': 'result', 'result': result.to_transport()})
+        for socket in sockets or list(self.subscribers):
+            socket.write(message)
+
+    def close(self):
+        self.timer.stop()
+        self.deleteLater()
+
+
+class WeatherDaemon(QObject):
+    def __init__(self, config, socket_path, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.locations = {}
+        self.sockets = set()
+        self.thread_pool = QThreadPool(self)
+        self.service = WeatherService.with_default_caches(config.settings.api_key)
+        self.limit_weather_ttl()
+        owm_client.set_base_url(config.settings.base_url)
+        self.on_quota_changed()
+        config.credentials_changed.connect(self.on_credentials_changed)
+        config.refresh_changed.connect(self.on_refresh_changed)
+        config.quota_changed.connect(self.on_quota_changed)
+
+        self.server = QLocalServer(self)
+        # Only this user's windows may connect
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+        probe = QLocalSocket()
+        probe.connectToServer(socket_path)
+        if probe.waitForConnected(200):
+            raise OSError(f'Another weather daemon is already listening on {socket_path}')
+        QLocalServer.removeServer(socket_path)  # Stale socket of a crashed daemon
+        if not self.server.listen(socket_path):
+            raise OSError(f'Cannot listen on {socket_path}: {self.server.errorString()}')
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.sockets.add(socket)
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.on_disconnected(socket))
+            # Lines that arrived with the connection were buffered before
+            # readyRead was connected, and won't be announced again
+            self.on_ready_read(socket)
+
+    def on_ready_read(self, socket):
+        for message in read_messages(socket):
+            city = message.get('city')
+            if not isinstance(city, str) or not city.strip():
+                continue
+            op = message.get('op')
+            if op == 'subscribe':
+                self.subscribe(socket, city)
+            elif op == 'unsubscribe':
+                self.unsubscribe(socket, city)
+            elif op == 'refresh':
+                location = self.locations.get(normalize_query(city))
+                if location is not None:
+                    location.fetch(USER)
+
+    def subscribe(self, socket, city):
+        key = normalize_query(city)
+        location = self.locations.get(key)
+        if location is None:
+            location = self.locations[key] = Location(self, city)
+            location.fetch(USER)
+        elif location.result is not None:
+            location.publish(location.result, [socket])
+        location.subscribers.add(socket)
+
+    def unsubscribe(self, socket, city):
+        key = normalize_query(city)
+        location = self.locations.get(key)
+        if location is None:
+            return
+        location.subscribers.discard(socket)
+        if not location.subscribers:
+            # Nobody is showing it any more, stop polling upstream for it
+            del self.locations[key]
+            location.close()
+
+    def on_disconnected(self, socket):
+        for location in list(self.locations.values()):
+            if socket in location.subscribers:
+                self.unsubscribe(socket, location.city)
+        self.sockets.discard(socket)
+        socket.deleteLater()
+
+    def on_credentials_changed(self):
+        settings = self.config.settings
+        owm_client.set_base_url(settings.base_url)
+        self.service.api_key = settings.api_key
+        for location in self.locations.values():
+            location.fetch()
+
+    def on_quota_changed(self):
+        # One budget for the whole host, so every window shares it
+        settings = self.config.settings
+        owm_client.set_quota(settings.calls_per_minute, settings.calls_per_day)
+
+    def on_refresh_changed(self):
+        self.limit_weather_ttl()
+        for location in self.locations.values():
+            location.timer.set_interval(self.config.settings.update_interval)
+
+    def limit_weather_ttl(self):
+        # An early jittered tick must not be answered from the cache
+        self.service.response_cache.limit_ttl(
+            'weather', earliest_refresh(self.config.settings.update_interval))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Fetch weather once per host for every WeatherApp window.')
+    parser.add_argument('--socket', help=f'Socket to listen on (default: {default_socket_path()})')
+    parser.add_argument('--config', default=resource_path(CONFIG_PATH),
+                        help='config.ini to read the API key and interval from')
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication(sys.argv[:1])
+    config = ConfigService(args.config, app)
+    socket_path = args.socket or resolve_socket_path(config.settings.daemon_socket)
+    try:
+        WeatherDaemon(config, socket_path, app)
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    # Python signal handlers only run between Qt events, so make some
+    wakeup = QTimer(app)
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(500)
+    print(f'Weather daemon listening on {socket_path}', flush=True)
+    exit_code = app.exec_()
+    QLocalServer.removeServer(socket_path)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import base64
+import time
+from dataclasses import dataclass, field
+
+from forecast_model import ForecastSeries
+
+
+@dataclass
+class WeatherResult:
+    """ Everything the UI needs to render one refresh, fetched off the GUI thread """
+    city: str
+    generation: int = 0
+    lat: float = None
+    lon: float = None
+    error: str = None
+    forecast_error: str = None
+    weather: dict = None
+    forecast: ForecastSeries = None
+    # ForecastSlot rows for the next hours, DailySummary rows per local day
+    hourly: list = field(default_factory=list)
+    daily: list = field(default_factory=list)
+    # Freshly downloaded PNG bytes keyed by (icon_code, variant), variant
+    # is '' or '@2x'; icons already in the IconStore are not repeated here
+    icons: dict = field(default_factory=dict)
+    # Cached data rendered while the worker revalidates it upstream
+    revalidating: bool = False
+    # Seconds since the oldest payload was fetched when upstream failed and
+    # the last good data is shown instead; None when the data is current
+    stale_age: float = None
+    # Set when upstream answered 429, so the refresh timer backs off harder
+    rate_limited: bool = False
+    retry_after: float = None
+
+    @property
+    def ok(self):
+        """ Whether upstream answered everything this refresh asked for """
+        return not (self.error or self.forecast_error or self.rate_limited
+                    or self.stale_age is not None)
+
+    def to_dict(self):
+        """ JSON-friendly view of the parsed data, without raw payloads or icon bytes """
+        data = {
+            'city': self.city,
+            'lat': self.lat,
+            'lon': self.lon,
+            'error': self.error or self.forecast_error,
+            'stale_age': self.stale_age,
+            'current': None,
+            'hourly': [slot._asdict() for slot in self.hourly],
+            'daily': [dict(day._asdict(), date=day.date.isoformat())
+                      for day in self.daily],
+        }
+        if self.weather is not None:
+            data['current'] = {
+                'temp': self.weather['main']['temp'],
+                'description': self.weather['weather'][0]['description'],
+                'icon': self.weather['weather'][0]['icon'],
+                'humidity': self.weather['main']['humidity'],
+                'wind_speed': self.weather['wind']['speed'],
+            }
+        return data
+
+    def to_transport(self):
+        """ Everything needed to rebuild this result in another process, JSON-friendly
+
+        Hourly and daily rows are left out, the receiver derives them from
+        the forecast for its own clock.
+        """
+        return {
+            'city': self.city,
+            'lat': self.lat,
+            'lon': self.lon,
+            'error': self.error,
+            'forecast_error': self.forecast_error,
+            'weather': self.weather,
+            'forecast': self.forecast.to_dict() if self.forecast is not None else None,
+            'icons': [[icon_code, variant, base64.b64encode(data).decode('ascii')]
+                      for (icon_code, variant), data in self.icons.items()],
+            'revalidating': self.revalidating,
+            'stale_age': self.stale_age,
+            'rate_limited': self.rate_limited,
+            'retry_after': self.retry_after,
+        }
+
+    @classmethod
+    def from_transport(cls, data, now=None):
+        """ Raises KeyError, TypeError or ValueError on a malformed message """
+        result = cls(
+            city=data['city'], lat=data.get('lat'), lon=data.get('lon'),
+            error=data.get('error'), forecast_error=data.get('forecast_error'),
+            weather=data.get('weather'),
+            icons={(icon_code, variant): base64.b64decode(encoded)
+                   for icon_code, variant, encoded in data.get('icons', [])},
+            revalidating=bool(data.get('revalidating')),
+            stale_age=data.get('stale_age'),
+            rate_limited=bool(data.get('rate_limited')),
+            retry_after=data.get('retry_after'))
+        if data.get('forecast'):
+            now = now if now is not None else time.time()
+            result.forecast = ForecastSeries.from_dict(data['forecast'])
+            result.hourly = result.forecast.next_slots(5, now)
+            result.daily = result.forecast.daily(5)
+        return result
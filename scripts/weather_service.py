@@ -0,0 +1,232 @@
+""" Qt-free weather data layer: geocode, fetch, cache and aggregate
+
+The GUI runs WeatherService.fetch on a worker thread; the weatherapp CLI
+calls it directly, so none of this may import PyQt5.
+"""
+import logging
+import os
+import sqlite3
+
+import requests
+
+import owm_client
+from app_paths import cache_dir, data_dir
+from forecast_model import ForecastSeries
+from gazetteer import default_gazetteer
+from icon_atlas import default_atlas
+from geocode_cache import GeocodeCache
+from icon_store import IconStore
+from metrics import metrics
+from observation_store import ObservationStore
+from request_budget import USER
+from response_cache import ResponseCache
+from weather_result import WeatherResult
+
+log = logging.getLogger(__name__)
+
+
+def open_observation_store(db_path):
+    """ The history store, or None when its database can't be opened """
+    try:
+        return ObservationStore(db_path)
+    except sqlite3.Error as exc:
+        # History is optional, a damaged or locked file mustn't stop refreshing
+        log.warning('Observation history disabled, cannot open %s: %s', db_path, exc)
+        return None
+
+
+def apply_weather(result, weather_data):
+    """ Store the current weather payload, returns the icon keys it needs """
+    result.weather = weather_data
+    return [(weather_data['weather'][0]['icon'], '@2x')]
+
+
+def apply_forecast(result, forecast_data):
+    """ Derive the hourly/daily rows, returns the icon keys they need """
+    with metrics.span('forecast_aggregate'):
+        result.forecast = ForecastSeries.from_payload(forecast_data)
+        result.hourly = result.forecast.next_slots(5)
+        result.daily = result.forecast.daily(5)
+
+    # One icon per distinct code, shared by hourly and daily widgets
+    codes = {slot.icon for slot in result.hourly}
+    codes.update(day.icon for day in result.daily)
+    return [(code, '') for code in codes]
+
+
+def flag_rate_limited(result, retry_after):
+    result.rate_limited = True
+    result.retry_after = max(result.retry_after or 0, retry_after or 0) or None
+
+
+def resolve_payload(endpoint, future, cached, lat, lon, response_cache, result=None):
+    """ Turn a (possibly conditional) response into (payload, stale_age, error)
+
+    A 429 answer, or a request shed by the quota budget, is flagged on
+    `result` so the caller can back off.
+    """
+    try:
+        response = future.result() if future is not None else None
+    except owm_client.RateLimited as exc:
+        response = None
+        if result is not None:
+            flag_rate_limited(result, exc.retry_after)
+    except requests.RequestException:
+        response = None
+
+    if response is not None and response.status_code == 429 and result is not None:
+        flag_rate_limited(result, owm_client.retry_after(response))
+
+    if response is not None and response.status_code == 200:
+        metrics.cache('response', 'miss')
+        payload = owm_client.decode_json(endpoint, response)
+        if response_cache is not None:
+            response_cache.put(endpoint, lat, lon, payload, response.headers,
+                               size=len(response.content))
+        return payload, None, None
+    if response is not None and response.status_code == 304 and cached:
+        metrics.cache('response', 'revalidated')
+        response_cache.touch(endpoint, lat, lon)
+        return cached.payload, None, None
+    if future is None and cached:
+        # Still fresh, nothing was requested
+        metrics.cache('response', 'hit')
+        return cached.payload, None, None
+
+    # Upstream failed, fall back to the last good payload when we have one
+    if cached is not None:
+        metrics.cache('response', 'stale')
+        return cached.payload, cached.age(), None
+    message = 'Unknown error'
+    if response is not None:
+        try:
+            message = owm_client.decode_json(endpoint, response).get(
+                'message', message)
+        except ValueError:
+            pass
+    return None, None, message
+
+
+class WeatherService:
+    """ Runs the geocode -> weather -> forecast -> icons pipeline against shared caches """
+
+    def __init__(self, api_key, icon_store=None, geocode_cache=None,
+                 response_cache=None, observation_store=None, gazetteer=None):
+        self.api_key = api_key
+        self.icon_store = icon_store
+        self.geocode_cache = geocode_cache
+        self.response_cache = response_cache
+        self.observation_store = observation_store
+        self.gazetteer = gazetteer
+
+    @classmethod
+    def with_default_caches(cls, api_key):
+        """ A service backed by the per-user caches and history the GUI also uses """
+        return cls(api_key,
+                   IconStore(cache_dir('icons'), default_atlas()),
+                   GeocodeCache(os.path.join(cache_dir(), 'geocode.sqlite')),
+                   ResponseCache(),
+                   open_observation_store(os.path.join(data_dir(), 'observations.sqlite')),
+                   default_gazetteer())
+
+    def fetch(self, city, generation=0, on_cached=None, include_forecast=True,
+              include_icons=True, priority=USER):
+        """ Fetch and aggregate everything needed to render `city`
+
+        When stale cached payloads exist they are passed to `on_cached` right
+        away as a revalidating result, before asking upstream for fresh ones.
+        With `include_forecast` off only current weather is fetched, and with
+        `include_icons` off no icon downloads are made. `priority` is the
+        request_budget priority, background refreshes are shed first.
+        """
+        api_key = self.api_key
+        icon_store = self.icon_store
+        response_cache = self.response_cache
+        result = WeatherResult(city=city, generation=generation)
+
+        # Get coordinates of the city
+        try:
+            coords = owm_client.geocode(city, api_key, self.geocode_cache,
+                                        self.gazetteer, priority)
+        except owm_client.RateLimited as exc:
+            result.error = 'Too many requests, retrying later.'
+            flag_rate_limited(result, exc.retry_after)
+            return result
+        if coords is None:
+            result.error = 'City not found. Please try again.'
+            return result
+        lat, lon = coords
+        result.lat, result.lon = coords
+
+        endpoints = ['weather', 'forecast'] if include_forecast else ['weather']
+        cached = dict.fromkeys(endpoints)
+        if response_cache is not None:
+            cached = {endpoint: response_cache.get(endpoint, lat, lon)
+                      for endpoint in cached}
+        fresh = {endpoint: response_cache is not None
+                 and response_cache.is_fresh(endpoint, entry)
+                 for endpoint, entry in cached.items()}
+
+        if on_cached is not None and all(cached.values()) and not all(fresh.values()):
+            interim = WeatherResult(city=city, generation=generation,
+                                    lat=lat, lon=lon, revalidating=True)
+            apply_weather(interim, cached['weather'].payload)
+            if include_forecast:
+                apply_forecast(interim, cached['forecast'].payload)
+            on_cached(interim)
+
+        # Current weather and the 5-day forecast are independent, fetch both at
+        # once, skipping whichever is still fresh and revalidating the rest
+        requests_by_endpoint = {'weather': owm_client.get_weather,
+                                'forecast': owm_client.get_forecast}
+        futures = {}
+        for endpoint, get_endpoint in requests_by_endpoint.items():
+            if endpoint in endpoints and not fresh[endpoint]:
+                futures[endpoint] = owm_client.executor.submit(
+                    get_endpoint, lat, lon, api_key,
+                    response_cache.conditional_headers(cached[endpoint])
+                    if response_cache is not None else None, priority)
+        pending = list(futures.values())
+        try:
+            weather_data, weather_age, error_message = resolve_payload(
+                'weather', futures.get('weather'), cached['weather'],
+                lat, lon, response_cache, result)
+            if weather_data is None:
+                result.error = ('Too many requests, retrying later.'
+                                if result.rate_limited else 'Error fetching weather data.')
+                return result
+
+            icon_keys = apply_weather(result, weather_data)
+            if self.observation_store is not None and weather_age is None:
+                try:
+                    with metrics.span('observation_record'):
+                        self.observation_store.record(lat, lon, weather_data)
+                except sqlite3.Error as exc:
+                    log.warning('Could not record observation: %s', exc)
+            icon_futures = owm_client.submit_icons(
+                icon_keys if include_icons else [], icon_store)
+            pending.extend(icon_futures.values())
+            if not include_forecast:
+                result.stale_age = weather_age
+                result.icons = owm_client.collect_icons(icon_futures, icon_store)
+                return result
+
+            forecast_data, forecast_age, error_message = resolve_payload(
+                'forecast', futures.get('forecast'), cached['forecast'],
+                lat, lon, response_cache, result)
+            ages = [age for age in (weather_age, forecast_age) if age is not None]
+            result.stale_age = max(ages) if ages else None
+            if forecast_data is None:
+                result.forecast_error = f'Error fetching forecast data: {error_message}'
+                result.icons = owm_client.collect_icons(icon_futures, icon_store)
+                return result
+
+            icon_keys = apply_forecast(result, forecast_data)
+            icon_futures.update(owm_client.submit_icons(
+                icon_keys if include_icons else [], icon_store))
+            pending.extend(icon_futures.values())
+
+            result.icons = owm_client.collect_icons(icon_futures, icon_store)
+            return result
+        finally:
+            owm_client.cancel(pending)
@@ -0,0 +1,35 @@
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from request_budget import USER
+from weather_service import WeatherResult
+
+
+class WorkerSignals(QObject):
+    finished = pyqtSignal(object)
+
+
+class WeatherFetchWorker(QRunnable):
+    """ Runs WeatherService.fetch on a QThreadPool and hands the result back via signals """
+
+    def __init__(self, service, city, generation, include_forecast=True,
+                 priority=USER):
+        super().__init__()
+        self.service = service
+        self.city = city
+        self.generation = generation
+        self.include_forecast = include_forecast
+        self.priority = priority
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.service.fetch(self.city, self.generation,
+                                        self.signals.finished.emit,
+                                        self.include_forecast,
+                                        priority=self.priority)
+        except Exception:
+            # Anything escaping run() would abort the process, and the
+            # window would wait for this fetch forever
+            result = WeatherResult(city=self.city, generation=self.generation,
+                                   error='Error fetching weather data.')
+        self.signals.finished.emit(result)
@@ -0,0 +1,149 @@
+""" Headless WeatherApp entry point, no QApplication or display needed
+
+    python scripts/weatherapp.py fetch "London, UK" --json
+    python scripts/weatherapp.py history "London, UK" --days 7
+"""
+import argparse
+import json
+import sys
+import time
+
+import requests
+
+import owm_client
+from app_config import CONFIG_PATH, load_config
+from app_paths import resource_path
+from weather_service import WeatherService
+
+NETWORK_ERROR = 'Could not reach OpenWeatherMap, check the connection and try again.'
+
+
+def format_text(data):
+    lines = [f"{data['city']} ({data['lat']:.4f}, {data['lon']:.4f})"]
+    current = data['current']
+    if current:
+        lines.append(
+            f"  Now: {int(current['temp'])}°C, {current['description'].title()}, "
+            f"humidity {current['humidity']}%, wind {current['wind_speed']} m/s")
+    if data['hourly']:
+        lines.append('  Next hours: ' + ', '.join(
+            f"{slot['local_time']} {int(slot['temp'])}°C" for slot in data['hourly']))
+    for day in data['daily']:
+        lines.append(
+            f"  {day['date']}: {int(day['temp_min'])}..{int(day['temp_max'])}°C, "
+            f"{day['description']}")
+    if data['stale_age'] is not None:
+        lines.append(f"  (offline, data is {int(data['stale_age'])} s old)")
+    if data['error']:
+        lines.append(f"  {data['error']}")
+    return '\n'.join(lines)
+
+
+def fetch_command(args, config):
+    api_key = args.api_key or config.api_key
+    city = args.city or config.city_location
+
+    owm_client.set_base_url(args.base_url or config.base_url)
+    owm_client.set_quota(config.calls_per_minute, config.calls_per_day)
+    service = WeatherService.with_default_caches(api_key)
+    try:
+        result = service.fetch(city, include_icons=False)
+    except requests.RequestException:
+        # The exception text holds the request URL and so the API key
+        print(NETWORK_ERROR, file=sys.stderr)
+        return 1
+    if result.error:
+        print(result.error, file=sys.stderr)
+        return 1
+
+    data = result.to_dict()
+    if args.json:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+    else:
+        print(format_text(data))
+    return 0 if not result.forecast_error else 1
+
+
+def format_history(city, observations):
+    lines = [city]
+    for row in observations:
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(row.dt))
+        lines.append(
+            f"  {when}  {row.temp:.1f}°C ({row.temp_min:.1f}..{row.temp_max:.1f}), "
+            f"humidity {row.humidity:.0f}%, wind {row.wind_speed:.1f} m/s")
+    if not observations:
+        lines.append('  No observations recorded yet.')
+    return '\n'.join(lines)
+
+
+def history_command(args, config):
+    api_key = args.api_key or config.api_key
+    city = args.city or config.city_location
+
+    owm_client.set_base_url(args.base_url or config.base_url)
+    owm_client.set_quota(config.calls_per_minute, config.calls_per_day)
+    service = WeatherService.with_default_caches(api_key)
+    # Geocoding hits the network only for a city never looked up before
+    try:
+        coords = owm_client.geocode(city, api_key, service.geocode_cache,
+                                    service.gazetteer)
+    except owm_client.RateLimited:
+        print('Too many requests, try again later.', file=sys.stderr)
+        return 1
+    except requests.RequestException:
+        print(NETWORK_ERROR, file=sys.stderr)
+        return 1
+    if coords is None:
+        print('City not found. Please try again.', file=sys.stderr)
+        return 1
+
+    if service.observation_store is None:
+        print('Observation history is unavailable.', file=sys.stderr)
+        return 1
+    seconds = args.days * 86400 if args.days else args.hours * 3600
+    observations = service.observation_store.recent(*coords, seconds)
+    if args.json:
+        print(json.dumps([row._asdict() for row in observations], indent=2))
+    else:
+        print(format_history(city, observations))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='weatherapp', description='Fetch OpenWeatherMap data without the GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = commands.add_parser(
+        'fetch', help='Current weather, next hours and daily forecast for a city')
+    fetch_parser.add_argument(
+        'city', nargs='?', help='City to look up (default: [default_city] from config.ini)')
+    fetch_parser.add_argument('--json', action='store_true',
+                              help='Print machine-readable JSON')
+    fetch_parser.add_argument('--api-key', help='Override the configured API key')
+    fetch_parser.add_argument('--base-url',
+                              help='Override the OpenWeatherMap base URL, e.g. a local stand-in')
+    fetch_parser.set_defaults(handler=fetch_command)
+
+    history_parser = commands.add_parser(
+        'history', help='Observations recorded for a city by earlier fetches')
+    history_parser.add_argument(
+        'city', nargs='?', help='City to look up (default: [default_city] from config.ini)')
+    span = history_parser.add_mutually_exclusive_group()
+    span.add_argument('--hours', type=int, default=24,
+                      help='Show the last N hours (default: 24)')
+    span.add_argument('--days', type=int,
+                      help='Show the last N days, hourly up to 60 days and daily beyond')
+    history_parser.add_argument('--json', action='store_true',
+                                help='Print machine-readable JSON')
+    history_parser.add_argument('--api-key', help='Override the configured API key')
+    history_parser.add_argument('--base-url',
+                                help='Override the OpenWeatherMap base URL, e.g. a local stand-in')
+    history_parser.set_defaults(handler=history_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args, load_config(resource_path(CONFIG_PATH)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())